@@ -0,0 +1,155 @@
+# admission.py
+"""
+Admission control for expensive endpoints.
+
+An `AdmissionController` admits up to `max_concurrent` requests at a time
+and lets at most `max_waiting` more wait (for up to `wait_timeout` seconds)
+for a slot. Anything beyond that is rejected immediately with a suggested
+Retry-After, so a spike cannot pile up unbounded work.
+
+Admitted work runs on the controller's own thread pool, sized to the limit,
+instead of Starlette's shared threadpool, so cheap endpoints (search, health,
+users) keep their capacity.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, TypeVar
+
+import metrics
+
+T = TypeVar("T")
+
+IN_FLIGHT = metrics.Gauge("admission_in_flight", "Requests currently admitted.", ["pool"])
+WAITING = metrics.Gauge("admission_queue_depth", "Requests waiting for a slot.", ["pool"])
+REJECTED = metrics.Counter("admission_rejected_total", "Requests rejected by admission control.", ["pool", "reason"])
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int, wait_timeout: float):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = wait_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._avg_service = 5.0   # seconds, EWMA of admitted work
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix=name)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """
+        Rough time until a slot frees up for a newcomer.
+        """
+        backlog = self.waiting + 1
+        return max(1, min(60, math.ceil(self._avg_service * backlog / self.max_concurrent)))
+
+    def _reject(self, reason: str) -> Rejected:
+        REJECTED.inc(pool=self.name, reason=reason)
+        return Rejected(reason, self.retry_after())
+
+    def _update_gauges(self) -> None:
+        IN_FLIGHT.set(self.in_flight, pool=self.name)
+        WAITING.set(self.waiting, pool=self.name)
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self._update_gauges()
+            return
+        if self.waiting >= self.max_waiting:
+            raise self._reject("queue_full")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.wait_timeout)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                return  # the slot arrived just as we timed out; keep it
+            fut.cancel()
+            raise self._reject("timeout")
+        except asyncio.CancelledError:
+            # client went away; hand over the slot if we were already given one
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                fut.cancel()
+            raise
+        finally:
+            if fut in self._waiters:
+                self._waiters.remove(fut)
+            self._update_gauges()
+
+    def release(self) -> None:
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)   # slot passes straight to the next waiter
+                self._update_gauges()
+                return
+        self.in_flight -= 1
+        self._update_gauges()
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Waits for a slot, then runs `fn` on the controller's thread pool with
+        the caller's context (so metrics/Server-Timing still apply). The slot
+        is released when the thread finishes, even if the client went away.
+        """
+        await self.acquire()
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        ctx = contextvars.copy_context()
+        try:
+            cfut = self._executor.submit(ctx.run, fn, *args, **kwargs)
+        except BaseException:
+            self.release()
+            raise
+        cfut.add_done_callback(lambda _: loop.call_soon_threadsafe(self._finished, start))
+        return await asyncio.wrap_future(cfut)
+
+    def _finished(self, start: float) -> None:
+        self._avg_service = 0.8 * self._avg_service + 0.2 * (time.perf_counter() - start)
+        self.release()
+
+    def has_idle(self, fraction: float) -> bool:
+        """
+        True while nobody waits and less than `fraction` of the slots are used;
+        background work (prefetch) runs only then.
+        """
+        return not self._waiters and self.in_flight < self.max_concurrent * fraction
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+        }
+
+
+def from_env(name: str, prefix: str, concurrent: int, waiting: int, timeout: float) -> AdmissionController:
+    return AdmissionController(
+        name,
+        int(os.getenv(f"{prefix}_MAX_CONCURRENCY", concurrent)),
+        int(os.getenv(f"{prefix}_MAX_QUEUE", waiting)),
+        float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", timeout)),
+    )
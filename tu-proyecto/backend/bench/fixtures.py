@@ -0,0 +1,271 @@
+# bench/fixtures.py
+"""
+Local stand-ins for PMC and the LLM provider, used by the benchmark suite.
+
+One threaded HTTP server answers:
+    GET  /pmc/articles/<id>/         a PMC article page (HTML)
+    GET  /pmc/articles/<id>/<f>.pdf  the same article as a PDF
+    POST /v1/chat/completions        OpenAI-compatible stub with configurable
+                                     latency and token rate
+
+The article page is a real open-access PMC page saved with `--record` to
+fixtures/pmc_recorded.html when that file exists. Otherwise the small
+hand-written stand-in fixtures/pmc_article.html is served; it has none of
+PMC's navigation markup, so extraction timings from it understate the real
+cost. Results record which page was used (`page_fixture`).
+
+Run standalone with:
+    python -m bench.fixtures --port 8765
+    python -m bench.fixtures --record https://pmc.ncbi.nlm.nih.gov/articles/PMC4136787/
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+ARTICLE_HTML = os.path.join(FIXTURES_DIR, "pmc_article.html")       # hand-written stand-in
+RECORDED_HTML = os.path.join(FIXTURES_DIR, "pmc_recorded.html")     # saved real PMC page
+
+
+class FixtureConfig:
+    def __init__(
+        self,
+        page_latency: float = 0.0,
+        llm_latency: float = 0.2,
+        token_rate: float = 200.0,
+        completion_tokens: int = 300,
+        page_file: Optional[str] = None,
+    ):
+        self.page_latency = page_latency            # seconds before a PMC page is served
+        self.llm_latency = llm_latency              # seconds to first token
+        self.token_rate = token_rate                # completion tokens per second
+        self.completion_tokens = completion_tokens
+        self.page_file = page_file or default_page_file()
+
+
+# ============================================================================
+# Article content
+# ============================================================================
+def default_page_file() -> str:
+    return RECORDED_HTML if os.path.exists(RECORDED_HTML) else ARTICLE_HTML
+
+
+def page_fixture_info(path: str) -> dict:
+    return {"file": os.path.basename(path), "bytes": os.path.getsize(path),
+            "recorded": os.path.basename(path) != os.path.basename(ARTICLE_HTML)}
+
+
+def record_page(url: str, path: str = RECORDED_HTML) -> int:
+    """
+    Saves a live article page as the benchmark fixture; returns its size.
+    """
+    import requests
+
+    r = requests.get(url, timeout=30, headers={"User-Agent": "Mozilla/5.0 (bench fixture recorder)"})
+    r.raise_for_status()
+    with open(path, "wb") as f:
+        f.write(r.content)
+    return len(r.content)
+
+
+def _html_to_lines(html: str) -> List[str]:
+    text = re.sub(r"<(script|style|header|footer)\b.*?</\1>", " ", html, flags=re.I | re.S)
+    text = re.sub(r"</(p|h1|h2)>", "\n", text, flags=re.I)
+    text = re.sub(r"<[^>]+>", " ", text)
+    lines: List[str] = []
+    for para in text.splitlines():
+        words = para.split()
+        line = ""
+        for w in words:
+            if len(line) + len(w) + 1 > 90:
+                lines.append(line)
+                line = w
+            else:
+                line = f"{line} {w}".strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def build_pdf(lines: List[str]) -> bytes:
+    """
+    Minimal single-font PDF (one page per 50 lines) that PyPDF2 can extract.
+    """
+    def esc(s: str) -> str:
+        return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    pages = [lines[i:i + 50] for i in range(0, len(lines), 50)] or [[""]]
+    objects: List[bytes] = []
+    n_pages = len(pages)
+    font_id = 3 + 2 * n_pages
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(n_pages))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>".encode())
+    for i, page_lines in enumerate(pages):
+        body = "BT /F1 10 Tf 12 TL 50 760 Td\n" + "".join(
+            f"({esc(l)}) Tj T*\n" for l in page_lines
+        ) + "ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _load_content(path: str):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        html = f.read()
+    return html.encode("utf-8"), build_pdf(_html_to_lines(html))
+
+
+# ============================================================================
+# HTTP server
+# ============================================================================
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "BenchFixture/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, ctype: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        cfg: FixtureConfig = self.server.config
+        path = self.path.split("?")[0]
+        if path == "/health":
+            return self._send(200, b"ok", "text/plain")
+        if not path.startswith("/pmc/articles/"):
+            return self._send(404, b"not found", "text/plain")
+        if cfg.page_latency:
+            time.sleep(cfg.page_latency)
+        if path.lower().endswith(".pdf"):
+            return self._send(200, self.server.pdf, "application/pdf")
+        return self._send(200, self.server.html, "text/html; charset=utf-8")
+
+    def do_POST(self):
+        cfg: FixtureConfig = self.server.config
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.path.split("?")[0].rstrip("/") != "/v1/chat/completions":
+            return self._send(404, b"not found", "text/plain")
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            return self._send(400, b'{"error": "invalid json"}', "application/json")
+
+        prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+        prompt_tokens = max(1, prompt_chars // 4)
+        completion_tokens = cfg.completion_tokens
+        delay = cfg.llm_latency + (completion_tokens / cfg.token_rate if cfg.token_rate > 0 else 0)
+        time.sleep(delay)
+
+        content = ("**Summary:** " + "benchmark " * completion_tokens).strip()
+        body = json.dumps({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "bench"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }).encode("utf-8")
+        self._send(200, body, "application/json")
+
+
+class FixtureServer:
+    """
+    Runs the fixture HTTP server on a background thread.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[FixtureConfig] = None):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or FixtureConfig()
+        self.httpd.html, self.httpd.pdf = _load_content(self.httpd.config.page_file)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def article_url(self, n: int = 1, pdf: bool = False) -> str:
+        url = f"{self.base_url}/pmc/articles/PMC{n:07d}/"
+        return url + "main.pdf" if pdf else url
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Serve PMC/LLM fixtures for benchmarks")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--page-latency", type=float, default=0.0)
+    ap.add_argument("--llm-latency", type=float, default=0.2)
+    ap.add_argument("--token-rate", type=float, default=200.0)
+    ap.add_argument("--completion-tokens", type=int, default=300)
+    ap.add_argument("--page-file", help="Article HTML to serve (default: recorded page, else stand-in)")
+    ap.add_argument("--record", metavar="URL", help=f"Save a live PMC article page to {RECORDED_HTML} and exit")
+    args = ap.parse_args()
+    if args.record:
+        size = record_page(args.record, args.page_file or RECORDED_HTML)
+        print(f"[bench] Recorded {size} bytes to {args.page_file or RECORDED_HTML}")
+        return
+    cfg = FixtureConfig(args.page_latency, args.llm_latency, args.token_rate, args.completion_tokens,
+                        args.page_file)
+    srv = FixtureServer(port=args.port, config=cfg)
+    print(f"[bench] Fixtures at {srv.base_url} (OPENAI_BASE_URL={srv.base_url}/v1), page {cfg.page_file}")
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+# bench/run.py
+"""
+Reproducible performance benchmarks for the backend.
+
+Starts the local fixtures (bench/fixtures.py), launches the apps under
+uvicorn with their external services pointed at those fixtures, drives the
+endpoints at a fixed concurrency and writes the results as JSON.
+
+    cd tu-proyecto/backend
+    python -m bench.run --concurrency 8 --requests 200 --out bench-results.json
+    python -m bench.run --compare bench-results.json   # diff against a previous run
+
+Apps:
+    server:app          /api/search, /api/suggest, /api/summarize (+ in-process micro benchmarks)
+    backend.main:app    /usuarios on a throwaway SQLite database
+
+The `suggest` suite builds the typeahead index over synthetic titles
+(--suggest-titles, 1M by default) and times lookups in-process.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from bench.fixtures import FixtureConfig, FixtureServer, page_fixture_info
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.dirname(BACKEND_DIR)
+
+SEARCH_QUERIES = ["microgravity", "bone loss", "space", "arabidopsis root", "radiation dna", "mice"]
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_kb(pid: int) -> Dict[str, Optional[int]]:
+    """
+    Current and peak resident set size of a process (Linux /proc only).
+    """
+    out: Dict[str, Optional[int]] = {"rss_kb": None, "peak_rss_kb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    out["rss_kb"] = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    out["peak_rss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return out
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    ms = [l * 1000 for l in latencies]
+    return {
+        "p50": round(percentile(ms, 50), 3),
+        "p95": round(percentile(ms, 95), 3),
+        "p99": round(percentile(ms, 99), 3),
+        "mean": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "max": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+class App:
+    """
+    A uvicorn subprocess serving one of the backend apps.
+    """
+
+    def __init__(self, target: str, cwd: str, env: Dict[str, str]):
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", target, "--port", str(self.port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=cwd, env={**os.environ, **env},
+        )
+
+    def wait_ready(self, path: str, timeout: float = 60.0) -> None:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"App exited with code {self.proc.returncode}")
+            try:
+                if requests.get(self.base_url + path, timeout=1).status_code < 500:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"App not ready after {timeout}s")
+
+    def stop(self) -> None:
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+# ============================================================================
+# Load generation
+# ============================================================================
+def run_load(name: str, call: Callable[[requests.Session, int], requests.Response],
+             n_requests: int, concurrency: int, pid: Optional[int] = None) -> Dict:
+    """
+    Issues `n_requests` calls from `concurrency` threads (one Session each)
+    and returns throughput, latency percentiles and the server RSS.
+    """
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_):
+        nonlocal errors
+        sess = getattr(local, "session", None)
+        if sess is None:
+            sess = local.session = requests.Session()
+        i = next(counter)
+        t0 = time.perf_counter()
+        try:
+            ok = call(sess, i).status_code < 400
+        except requests.RequestException:
+            ok = False
+        dt = time.perf_counter() - t0
+        with lock:
+            latencies.append(dt)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "scenario": name,
+        "kind": "http",
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(n_requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+    }
+    if pid is not None:
+        result.update(rss_kb(pid))
+    print(f"[bench] {name:<28} {result['throughput_rps']:>9} req/s  "
+          f"p50={result['latency_ms']['p50']}ms p99={result['latency_ms']['p99']}ms errors={errors}")
+    return result
+
+
+def run_micro(name: str, fn: Callable[[int], object], iterations: int) -> Dict:
+    """
+    Times a function in-process, without HTTP in the way.
+    """
+    latencies: List[float] = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    total = sum(latencies)
+    result = {
+        "scenario": name,
+        "kind": "micro",
+        "iterations": iterations,
+        "throughput_ops": round(iterations / total, 2) if total else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+    }
+    print(f"[bench] {name:<28} {result['throughput_ops']:>9} op/s   p50={result['latency_ms']['p50']}ms")
+    return result
+
+
+# ============================================================================
+# Suites
+# ============================================================================
+def bench_server(fx: FixtureServer, args) -> List[Dict]:
+    env = {
+        "API_KEY": "bench",
+        "OPENAI_BASE_URL": fx.base_url + "/v1",
+        "MODEL_NAME": "bench",
+        # measure the full fetch + extract path on every summarize, not cache hits
+        "EXTRACTION_CACHE_SIZE": "0",
+        "PREFETCH_TOP_N": "0",
+    }
+    app = App("server:app", BACKEND_DIR, env)
+    results: List[Dict] = []
+    try:
+        app.wait_ready("/api/health")
+        pid = app.proc.pid
+        results.append({"scenario": "server_idle", "kind": "rss", **rss_kb(pid)})
+
+        def search(s, i):
+            q = SEARCH_QUERIES[i % len(SEARCH_QUERIES)]
+            return s.get(f"{app.base_url}/api/search", params={"q": q}, timeout=30)
+
+        def health(s, i):
+            return s.get(f"{app.base_url}/api/health", timeout=30)
+
+        def summarize(s, i):
+            url = fx.article_url(i + 1, pdf=(i % 4 == 3))
+            return s.get(f"{app.base_url}/api/summarize",
+                         params={"url": url, "userType": "student", "userInterests": "bone, radiation"},
+                         timeout=120)
+
+        results.append(run_load("GET /api/health", health, args.requests, args.concurrency, pid))
+        results.append(run_load("GET /api/search", search, args.requests, args.concurrency, pid))
+
+        def suggest(s, i):
+            q = SEARCH_QUERIES[i % len(SEARCH_QUERIES)]
+            return s.get(f"{app.base_url}/api/suggest", params={"prefix": q[: i % 4 + 1]}, timeout=30)
+
+        results.append(run_load("GET /api/suggest", suggest, args.requests, args.concurrency, pid))
+        results.append(run_load("GET /api/summarize", summarize, args.summarize_requests, args.concurrency, pid))
+    finally:
+        app.stop()
+    return results
+
+
+def bench_micro(fx: FixtureServer, args) -> List[Dict]:
+    os.environ.setdefault("API_KEY", "bench")
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+    import summary
+
+    results = [
+        run_micro("server.search", lambda i: server.search(SEARCH_QUERIES[i % len(SEARCH_QUERIES)]),
+                  args.micro_iterations),
+        run_micro("extract_text_from_url html", lambda i: summary.extract_text_from_url(fx.article_url(i + 1)),
+                  max(1, args.micro_iterations // 10)),
+        run_micro("extract_text_from_url pdf", lambda i: summary.extract_text_from_url(fx.article_url(i + 1, pdf=True)),
+                  max(1, args.micro_iterations // 10)),
+    ]
+    return results
+
+
+def synthetic_titles(n: int, seed: int = 1234) -> List[str]:
+    """
+    Titles drawn from the real catalog vocabulary plus a long tail of
+    pseudo-words (gene names, strains...), with Zipf-like frequencies.
+    """
+    import numpy as np
+
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+    from suggest import title_terms
+
+    rng = np.random.default_rng(seed)
+    real = sorted({w for item in server.DATA for w in title_terms(item["title"])})
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    n_tail = max(1000, n // 5)
+    stems = rng.choice(letters, size=(n_tail, 10))
+    stem_lens = rng.integers(4, 11, size=n_tail)
+    suffixes = rng.integers(0, 100, size=n_tail)
+    tail = sorted({"".join(stems[i, :stem_lens[i]]) + str(suffixes[i]) for i in range(n_tail)})
+    vocab = real + tail
+    rng.shuffle(vocab)
+
+    p = 1.0 / np.arange(1, len(vocab) + 1)
+    lengths = rng.integers(6, 15, size=n)
+    words = rng.choice(len(vocab), size=int(lengths.sum()), p=p / p.sum()).tolist()
+    titles, pos = [], 0
+    for length in lengths.tolist():
+        titles.append(" ".join([vocab[w] for w in words[pos:pos + length]]))
+        pos += length
+    return titles
+
+
+def bench_suggest(args) -> List[Dict]:
+    from suggest import Suggester
+
+    titles = synthetic_titles(args.suggest_titles)
+    t0 = time.perf_counter()
+    sug = Suggester.from_titles(titles)
+    build_s = time.perf_counter() - t0
+    print(f"[bench] suggest index over {len(titles)} titles: {len(sug.terms)} terms, "
+          f"{len(sug.top)} precomputed prefixes, built in {build_s:.1f}s")
+
+    # What a worker pays at startup when the index comes from the snapshot
+    from snapshot import META_SECTION, Snapshot, write_snapshot
+
+    snap_dir = tempfile.mkdtemp(prefix="bench-snap-")
+    snap_path = os.path.join(snap_dir, "suggest.snap")
+    write_snapshot(snap_path, {META_SECTION: b"{}", **sug.to_sections()})
+    snap = Snapshot(snap_path)
+    t0 = time.perf_counter()
+    Suggester.from_snapshot(snap, len(titles))
+    load_s = time.perf_counter() - t0
+    snap.close()
+    shutil.rmtree(snap_dir, ignore_errors=True)
+    print(f"[bench] suggest index loaded from snapshot in {load_s:.1f}s")
+
+    rng = random.Random(99)
+    prefixes = [t[: rng.randint(1, min(6, len(t)))] for t in rng.sample(sug.terms, min(5000, len(sug.terms)))]
+    result = run_micro("Suggester.suggest", lambda i: sug.suggest(prefixes[i % len(prefixes)]),
+                       args.micro_iterations * 50)
+    result.update({"titles": len(titles), "terms": len(sug.terms), "build_s": round(build_s, 3),
+                   "load_s": round(load_s, 3)})
+    return [result]
+
+
+def bench_usuarios(args) -> List[Dict]:
+    db_dir = tempfile.mkdtemp(prefix="bench-db-")
+    env = {"DATABASE_URL": f"sqlite:///{os.path.join(db_dir, 'bench.db')}"}
+    app = App("backend.main:app", PROJECT_DIR, env)
+    run_id = int(time.time())
+    results: List[Dict] = []
+    try:
+        app.wait_ready("/perfiles/")
+        pid = app.proc.pid
+
+        def crear(s, i):
+            return s.post(f"{app.base_url}/usuarios/", json={
+                "nombre": f"Bench {i}",
+                "correo": f"bench{run_id}_{i}@example.com",
+                "contrasena": "bench",
+                "perfil_id": i % 5 + 1,
+                "experiencia_id": i % 3 + 1,
+            }, timeout=30)
+
+        def buscar(s, i):
+            return s.get(f"{app.base_url}/usuarios/buscar_por_correo",
+                         params={"correo": f"bench{run_id}_{i % args.requests}@example.com"}, timeout=30)
+
+        def listar(s, i):
+            return s.get(f"{app.base_url}/usuarios/", timeout=30)
+
+        results.append(run_load("POST /usuarios/", crear, args.requests, args.concurrency, pid))
+        results.append(run_load("GET /usuarios/buscar_por_correo", buscar, args.requests, args.concurrency, pid))
+        results.append(run_load("GET /usuarios/", listar, max(1, args.requests // 4), args.concurrency, pid))
+    finally:
+        app.stop()
+    return results
+
+
+# ============================================================================
+# Comparison
+# ============================================================================
+def compare(previous: Dict, current: Dict) -> None:
+    """
+    Prints the p50/p95 change per scenario between two result files.
+    """
+    before = {r["scenario"]: r for r in previous.get("results", []) if "latency_ms" in r}
+    for r in current.get("results", []):
+        old = before.get(r["scenario"])
+        if not old or "latency_ms" not in r:
+            continue
+        parts = []
+        for key in ("p50", "p95"):
+            a, b = old["latency_ms"][key], r["latency_ms"][key]
+            delta = (b - a) / a * 100 if a else 0.0
+            parts.append(f"{key} {a}->{b}ms ({delta:+.1f}%)")
+        print(f"[bench] {r['scenario']:<28} " + "  ".join(parts))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Backend performance benchmarks")
+    ap.add_argument("--suite", action="append", choices=["server", "micro", "usuarios", "suggest"],
+                    help="Suites to run (default: all)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--summarize-requests", type=int, default=40)
+    ap.add_argument("--micro-iterations", type=int, default=200)
+    ap.add_argument("--suggest-titles", type=int, default=1_000_000)
+    ap.add_argument("--page-latency", type=float, default=0.05)
+    ap.add_argument("--llm-latency", type=float, default=0.2)
+    ap.add_argument("--token-rate", type=float, default=200.0)
+    ap.add_argument("--completion-tokens", type=int, default=300)
+    ap.add_argument("--page-file", help="Article HTML served by the fixtures (default: bench/fixtures/pmc_recorded.html "
+                                        "if recorded, else the hand-written stand-in)")
+    ap.add_argument("--out", default="bench-results.json")
+    ap.add_argument("--compare", help="Previous results file to diff against")
+    args = ap.parse_args()
+    suites = args.suite or ["server", "micro", "usuarios", "suggest"]
+
+    cfg = FixtureConfig(args.page_latency, args.llm_latency, args.token_rate, args.completion_tokens,
+                        args.page_file)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+            "page_fixture": page_fixture_info(cfg.page_file),
+        },
+        "results": [],
+    }
+    with FixtureServer(config=cfg) as fx:
+        if "server" in suites:
+            report["results"] += bench_server(fx, args)
+        if "usuarios" in suites:
+            report["results"] += bench_usuarios(args)
+        if "micro" in suites:
+            report["results"] += bench_micro(fx, args)
+        if "suggest" in suites:
+            report["results"] += bench_suggest(args)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] Results written to {args.out}")
+
+    if previous is not None:
+        compare(previous, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# backend/catalog.py
+"""
+Catalog source paths and CSV parsing.
+
+Kept free of side effects so the snapshot builder (snapshot.py) can use it
+without importing the whole app.
+"""
+from urllib.parse import urlparse
+from typing import List, Dict
+import csv, os
+
+BASE_DIR = os.path.dirname(__file__)
+CSV_PATH = os.path.join(BASE_DIR, "data", os.getenv("CSV_FILE", "SB_publication_PMC.csv"))
+SNAPSHOT_PATH = os.path.join(BASE_DIR, "data", os.getenv("SNAPSHOT_FILE", "catalog.snap"))
+
+def _first_nonempty(d: dict, keys: list[str]) -> str:
+    for k in keys:
+        v = d.get(k)
+        if v is not None:
+            v = v.strip()
+            if v:
+                return v
+    return ""
+
+def _domain(u: str) -> str | None:
+    try:
+        return urlparse(u).netloc or None
+    except:
+        return None
+
+def parse_csv(path: str) -> List[Dict]:
+    """
+    Parses the publications CSV into catalog rows.
+    """
+    data: List[Dict] = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for i, row in enumerate(reader):
+            title = _first_nonempty(row, ["title", "Title"])
+            url   = _first_nonempty(row, ["url", "URL", "Url", "link", "Link", "HREF", "Href"])
+            if not title or not url:
+                continue
+            source = _first_nonempty(row, ["source", "Source", "domain", "Domain"]) or _domain(url)
+            data.append({"id": i+1, "title": title, "url": url, "source": source})
+    return data
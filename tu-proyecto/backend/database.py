@@ -16,11 +16,12 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
-# Construir la URL de conexión para MySQL
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Construir la URL de conexión para MySQL (DATABASE_URL permite usar otra, p. ej. SQLite)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# Crear el engine
-engine = create_engine(DATABASE_URL)
+# Crear el engine (SQLite necesita compartir la conexión entre hilos del threadpool)
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(DATABASE_URL, connect_args=connect_args)
 
 # Crear una sesión
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
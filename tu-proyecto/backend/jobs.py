@@ -0,0 +1,422 @@
+# jobs.py
+"""
+Asynchronous summarization jobs.
+
+Clients submit a job and poll for its result instead of keeping an HTTP
+request open while the article is fetched and summarized:
+
+    POST /api/summaries          -> {"id": ..., "status": "queued"}
+    GET  /api/summaries/{id}     -> {"status": "done", "result": {...}}
+
+A bounded pool of worker threads takes jobs from an in-process priority
+queue. Job records live in a pluggable store: in memory by default, or a
+SQLite file (SUMMARY_JOBS_DB) shared by every uvicorn worker on the host.
+Jobs with the same key are deduplicated and results expire after a TTL.
+
+Each queued/running job carries a lease that its owner process renews
+every LEASE_RENEW seconds. In SQLite mode, a job whose lease ran out (its
+owner died) is adopted by the next process that scans or dedupes onto it.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import metrics
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+DEFAULT_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+DEFAULT_QUEUE_SIZE = int(os.getenv("SUMMARY_QUEUE_SIZE", "100"))
+DEFAULT_RESULT_TTL = float(os.getenv("SUMMARY_RESULT_TTL", "3600"))
+MAX_PRIORITY = int(os.getenv("SUMMARY_MAX_PRIORITY", "10"))   # highest priority a client may ask for
+FAILED_TTL = 60.0         # failed jobs are kept briefly so pollers see the error
+LEASE = 60.0              # a queued/running job not renewed for this long belonged to a dead process
+LEASE_RENEW = 15.0        # how often owners renew their leases and scan for abandoned jobs
+
+JOBS_QUEUED = metrics.Gauge("summary_jobs_queued", "Summary jobs waiting for a worker.")
+JOBS_RUNNING = metrics.Gauge("summary_jobs_running", "Summary jobs being processed.")
+JOBS_FINISHED = metrics.Counter("summary_jobs_finished_total", "Summary jobs finished, by status.", ["status"])
+
+
+class QueueFull(Exception):
+    pass
+
+
+def job_key(params: Dict) -> str:
+    """
+    Identity used for deduplication: the same URL summarized for the same profile.
+    """
+    raw = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def new_job(key: str, params: Dict, priority: int, owner: Optional[str] = None) -> Dict:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "key": key,
+        "status": QUEUED,
+        "priority": priority,
+        "params": params,
+        "result": None,
+        "error": None,
+        "created": now,
+        "updated": now,
+        "expires": None,
+        "owner": owner,
+        "lease": now + LEASE,
+    }
+
+
+def is_abandoned(job: Dict, now: float) -> bool:
+    return job["status"] in (QUEUED, RUNNING) and (job.get("lease") or 0) < now
+
+
+def public_view(job: Dict) -> Dict:
+    out = {k: job[k] for k in ("id", "status", "created", "updated")}
+    if job["status"] == DONE:
+        out["result"] = job["result"]
+    elif job["status"] == FAILED:
+        out["error"] = job["error"]
+    return out
+
+
+# ============================================================================
+# Stores
+# ============================================================================
+class MemoryJobStore:
+    """
+    Job records in a dict; visible to this process only.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get_by_key(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            job_id = self._by_key.get(key)
+            job = self._jobs.get(job_id) if job_id else None
+            return dict(job) if job else None
+
+    def put(self, job: Dict) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+            self._by_key[job["key"]] = job["id"]
+
+    def claim(self, job_id: str) -> Optional[Dict]:
+        """
+        Atomically moves a queued job to running; None if someone else took it.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                return None
+            job["status"] = RUNNING
+            job["updated"] = time.time()
+            return dict(job)
+
+    def requeue(self, job_id: str, updated: float, owner: str) -> Optional[Dict]:
+        """
+        Moves an abandoned job back to queued under `owner`, only if nobody
+        touched it since it was read (`updated` unchanged).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in (QUEUED, RUNNING) or job["updated"] != updated:
+                return None
+            now = time.time()
+            job.update(status=QUEUED, owner=owner, updated=now, lease=now + LEASE)
+            return dict(job)
+
+    def renew(self, owner: str, now: float) -> None:
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] in (QUEUED, RUNNING) and job.get("owner") == owner:
+                    job["lease"] = now + LEASE
+
+    def pending(self) -> List[Dict]:
+        return []
+
+    def purge_expired(self, now: float) -> int:
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j["expires"] is not None and j["expires"] <= now]
+            for job in expired:
+                del self._jobs[job["id"]]
+                if self._by_key.get(job["key"]) == job["id"]:
+                    del self._by_key[job["key"]]
+            return len(expired)
+
+
+_COLUMNS = "id, key, status, priority, params, result, error, created, updated, expires, owner, lease"
+
+
+class SQLiteJobStore:
+    """
+    Job records in a SQLite file, so any worker process can answer polls.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summary_jobs ("
+            " id TEXT PRIMARY KEY, key TEXT NOT NULL, status TEXT NOT NULL, priority INTEGER NOT NULL,"
+            " params TEXT NOT NULL, result TEXT, error TEXT,"
+            " created REAL NOT NULL, updated REAL NOT NULL, expires REAL, owner TEXT, lease REAL)"
+        )
+        for column in ("owner TEXT", "lease REAL"):  # tables created before leases
+            try:
+                self._conn.execute(f"ALTER TABLE summary_jobs ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summary_jobs_key ON summary_jobs (key, created)")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row(row) -> Optional[Dict]:
+        if row is None:
+            return None
+        job_id, key, status, priority, params, result, error, created, updated, expires, owner, lease = row
+        return {
+            "id": job_id, "key": key, "status": status, "priority": priority,
+            "params": json.loads(params), "result": json.loads(result) if result else None,
+            "error": error, "created": created, "updated": updated, "expires": expires,
+            "owner": owner, "lease": lease,
+        }
+
+    def _one(self, sql: str, args: tuple) -> Optional[Dict]:
+        with self._lock:
+            return self._row(self._conn.execute(sql, args).fetchone())
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self._one(f"SELECT {_COLUMNS} FROM summary_jobs WHERE id = ?", (job_id,))
+
+    def get_by_key(self, key: str) -> Optional[Dict]:
+        return self._one(f"SELECT {_COLUMNS} FROM summary_jobs WHERE key = ? ORDER BY created DESC LIMIT 1", (key,))
+
+    def put(self, job: Dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO summary_jobs ({_COLUMNS})"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["key"], job["status"], job["priority"],
+                 json.dumps(job["params"]), json.dumps(job["result"]) if job["result"] is not None else None,
+                 job["error"], job["created"], job["updated"], job["expires"], job.get("owner"), job.get("lease")),
+            )
+
+    def claim(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE summary_jobs SET status = ?, updated = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED))
+            if cur.rowcount != 1:
+                return None
+            return self._row(self._conn.execute(
+                f"SELECT {_COLUMNS} FROM summary_jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def requeue(self, job_id: str, updated: float, owner: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE summary_jobs SET status = ?, owner = ?, updated = ?, lease = ?"
+                " WHERE id = ? AND status IN (?, ?) AND updated = ?",
+                (QUEUED, owner, now, now + LEASE, job_id, QUEUED, RUNNING, updated))
+            if cur.rowcount != 1:
+                return None
+            return self._row(self._conn.execute(
+                f"SELECT {_COLUMNS} FROM summary_jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def renew(self, owner: str, now: float) -> None:
+        """
+        Extends the lease of every queued/running job owned by `owner`.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE summary_jobs SET lease = ? WHERE owner = ? AND status IN (?, ?)",
+                (now + LEASE, owner, QUEUED, RUNNING))
+
+    def pending(self) -> List[Dict]:
+        """
+        Queued or running jobs whose lease ran out because their process died.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM summary_jobs WHERE status IN (?, ?) AND (lease IS NULL OR lease < ?)",
+                (QUEUED, RUNNING, time.time())).fetchall()
+        return [self._row(r) for r in rows]
+
+    def purge_expired(self, now: float) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM summary_jobs WHERE expires IS NOT NULL AND expires <= ?", (now,))
+            return cur.rowcount
+
+
+# ============================================================================
+# Queue
+# ============================================================================
+class JobQueue:
+    """
+    Bounded priority queue of jobs served by a fixed pool of worker threads.
+    Higher `priority` runs first; equal priorities run in submission order.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict], Dict],
+        store=None,
+        workers: int = DEFAULT_WORKERS,
+        max_queued: int = DEFAULT_QUEUE_SIZE,
+        result_ttl: float = DEFAULT_RESULT_TTL,
+    ):
+        self.handler = handler
+        self.store = store or MemoryJobStore()
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._last_purge = 0.0
+        self.running = 0
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._adopt_abandoned()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"summary-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            t = threading.Thread(target=self._maintain, name="summary-job-lease", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _adopt(self, job: Dict) -> Optional[Dict]:
+        """
+        Takes over an abandoned job (conditional on it being unchanged since
+        read, so a job another process just finished is left alone).
+        """
+        adopted = self.store.requeue(job["id"], job["updated"], self.owner)
+        if adopted is not None:
+            self._enqueue(adopted)
+        return adopted
+
+    def _adopt_abandoned(self) -> None:
+        for job in self.store.pending():
+            self._adopt(job)
+
+    def _maintain(self) -> None:
+        """
+        Renews this process's leases and picks up jobs abandoned by others.
+        """
+        while True:
+            time.sleep(LEASE_RENEW)
+            try:
+                self.store.renew(self.owner, time.time())
+                with self._lock:
+                    self._adopt_abandoned()
+                self._maybe_purge()
+            except Exception as e:
+                print("[jobs] Lease maintenance failed:", e)
+
+    def _enqueue(self, job: Dict) -> None:
+        self._queue.put((-job["priority"], next(self._seq), job["id"]))
+        JOBS_QUEUED.set(self._queue.qsize())
+
+    def submit(self, params: Dict, priority: int = 0) -> Dict:
+        """
+        Returns the existing job for the same key if it is still pending or has
+        an unexpired result; otherwise queues a new one. Raises QueueFull.
+        """
+        self.start()
+        self._maybe_purge()
+        key = job_key(params)
+        with self._lock:
+            existing = self.store.get_by_key(key)
+            now = time.time()
+            if existing and is_abandoned(existing, now):
+                adopted = self._adopt(existing)
+                if adopted is not None:
+                    metrics.cache_lookup("summary_jobs", True)
+                    return adopted
+                existing = self.store.get(existing["id"])
+            if existing and existing["status"] != FAILED and (existing["expires"] is None or existing["expires"] > now):
+                metrics.cache_lookup("summary_jobs", True)
+                return existing
+            metrics.cache_lookup("summary_jobs", False)
+            if self._queue.qsize() >= self.max_queued:
+                raise QueueFull()
+            job = new_job(key, params, priority, self.owner)
+            self.store.put(job)
+            self._enqueue(job)
+            return job
+
+    def has_idle(self, fraction: float) -> bool:
+        """
+        True while no job waits and less than `fraction` of the workers are busy.
+        """
+        return self._queue.empty() and self.running < self.workers * fraction
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        if job and job["expires"] is not None and job["expires"] <= time.time():
+            return None
+        return job
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge > 60:
+            self._last_purge = now
+            self.store.purge_expired(now)
+
+    def _work(self) -> None:
+        while True:
+            _, _, job_id = self._queue.get()
+            JOBS_QUEUED.set(self._queue.qsize())
+            job = self.store.claim(job_id)
+            if job is None:
+                continue
+            JOBS_RUNNING.inc()
+            with self._lock:
+                self.running += 1
+            try:
+                job["result"] = self.handler(job["params"])
+                job["status"] = DONE
+                ttl = self.result_ttl
+            except Exception as e:
+                job["error"] = str(e)
+                job["status"] = FAILED
+                ttl = FAILED_TTL
+            finally:
+                JOBS_RUNNING.dec()
+                with self._lock:
+                    self.running -= 1
+            job["updated"] = time.time()
+            job["expires"] = job["updated"] + ttl
+            self.store.put(job)
+            JOBS_FINISHED.inc(status=job["status"])
+
+
+def store_from_env():
+    path = os.getenv("SUMMARY_JOBS_DB")
+    return SQLiteJobStore(path) if path else MemoryJobStore()
@@ -4,6 +4,7 @@ from backend.database import Base, engine
 from backend.api import usuario_api, experiencia_api, perfil_api  
 from backend.entidades import usuario
 from backend.rellenado_datos import perfiles_rll, experiencia_rll
+from backend import metrics
 from fastapi.middleware.cors import CORSMiddleware
 # backend/server.py
 from fastapi import FastAPI, Query, HTTPException
@@ -22,8 +23,13 @@ app.add_middleware(
     allow_credentials=True,         # cookies o tokens
     allow_methods=["*"],            # GET, POST, PUT, DELETE...
     allow_headers=["*"],            # cabeceras como Authorization, Content-Type, etc.
+    expose_headers=["Server-Timing"],
 )
 
+# métricas: /metrics, cabecera Server-Timing y tiempo de cada consulta SQL
+metrics.instrument_app(app)
+metrics.instrument_engine(engine)
+
 
 # Borra y crea todas las tablas
 Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,430 @@
+# metrics.py
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+- Counters, gauges and histograms live in process memory, thread-safe and
+  cheap enough to leave on in production.
+- With several uvicorn workers behind one port, set METRICS_MULTIPROC_DIR to
+  an empty directory: every worker then writes its values to a file there
+  (about once per METRICS_FLUSH_INTERVAL seconds) and /metrics, whichever
+  worker answers, reports the sum over all workers. Counters and histograms
+  of exited workers keep counting; gauges only include live workers.
+- Stage timings recorded while a request is being served are also echoed
+  back in a `Server-Timing` header (see `instrument_app`).
+
+Usage:
+    with metrics.timed("fetch"):
+        r = requests.get(url)
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# ============================================================================
+# Metric types
+# ============================================================================
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+TOKEN_BUCKETS = (64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+LabelValues = Tuple[str, ...]
+
+
+def _fmt_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        return self.render_state(self.state())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def state(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(states: List[Dict[LabelValues, float]]) -> Dict[LabelValues, float]:
+        out: Dict[LabelValues, float] = {}
+        for state in states:
+            for key, v in state.items():
+                out[key] = out.get(key, 0) + v
+        return out
+
+    def dump(self) -> list:
+        return [[list(k), v] for k, v in self.state().items()]
+
+    @staticmethod
+    def load(raw: list) -> Dict[LabelValues, float]:
+        return {tuple(k): v for k, v in raw}
+
+    def render_state(self, state: Dict[LabelValues, float]) -> List[str]:
+        lines = self.header()
+        for key, v in state.items():
+            lines.append(f"{self.name}{_fmt_labels(self.labels, key)} {_fmt_num(v)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][idx] += 1
+            entry[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def state(self) -> Dict[LabelValues, Tuple[List[int], float]]:
+        with self._lock:
+            return {k: (list(c), s[0]) for k, (c, s) in self._values.items()}
+
+    @staticmethod
+    def merge(states: List[Dict]) -> Dict[LabelValues, Tuple[List[int], float]]:
+        out: Dict[LabelValues, Tuple[List[int], float]] = {}
+        for state in states:
+            for key, (counts, total) in state.items():
+                prev = out.get(key)
+                if prev is None:
+                    out[key] = (list(counts), total)
+                else:
+                    out[key] = ([a + b for a, b in zip(prev[0], counts)], prev[1] + total)
+        return out
+
+    def dump(self) -> list:
+        return [[list(k), c, s] for k, (c, s) in self.state().items()]
+
+    @staticmethod
+    def load(raw: list) -> Dict:
+        return {tuple(k): (c, s) for k, c, s in raw}
+
+    def render_state(self, state: Dict) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in state.items():
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = f'le="{_fmt_num(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {_fmt_num(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_latest() -> str:
+    if MULTIPROC_DIR:
+        return render_multiprocess(MULTIPROC_DIR)
+    lines: List[str] = []
+    for m in REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# Multi-worker aggregation (METRICS_MULTIPROC_DIR)
+# ============================================================================
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))
+
+_flusher: Optional[threading.Thread] = None
+_write_lock = threading.Lock()   # the flusher and /metrics renders share one temp file
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_process_file(directory: str) -> None:
+    """
+    Writes this process's values to <directory>/metrics_<pid>.json atomically.
+    """
+    pid = os.getpid()
+    path = os.path.join(directory, f"metrics_{pid}.json")
+    tmp = f"{path}.tmp"
+    with _write_lock:
+        data = {m.name: m.dump() for m in REGISTRY}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+
+def _flush_forever(directory: str) -> None:
+    while True:
+        try:
+            write_process_file(directory)
+        except Exception as e:
+            print("[metrics] Could not write metrics file:", e)
+        time.sleep(FLUSH_INTERVAL)
+
+
+def start_flusher(directory: str) -> None:
+    global _flusher
+    if _flusher is not None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _flusher = threading.Thread(target=_flush_forever, args=(directory,), name="metrics-flush", daemon=True)
+    _flusher.start()
+
+
+def render_multiprocess(directory: str) -> str:
+    """
+    Sums every worker's file. This process is written first so its own
+    values are current; the others are at most FLUSH_INTERVAL old.
+    """
+    write_process_file(directory)
+    per_metric: Dict[str, List] = {m.name: [] for m in REGISTRY}
+    for fname in os.listdir(directory):
+        if not (fname.startswith("metrics_") and fname.endswith(".json")):
+            continue
+        try:
+            pid = int(fname[len("metrics_"):-len(".json")])
+            with open(os.path.join(directory, fname), encoding="utf-8") as f:
+                data = json.load(f)
+        except (ValueError, OSError):
+            continue
+        alive = _pid_alive(pid)
+        for m in REGISTRY:
+            if m.name not in data or (m.kind == "gauge" and not alive):
+                continue
+            per_metric[m.name].append(m.load(data[m.name]))
+    lines: List[str] = []
+    for m in REGISTRY:
+        lines.extend(m.render_state(m.merge(per_metric[m.name])))
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# Application metrics
+# ============================================================================
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ["method", "route", "status"])
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size.", ["route"], buckets=SIZE_BUCKETS)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Time spent per processing stage (queue, fetch, extract, llm, db).", ["stage"])
+STAGE_ERRORS = Counter(
+    "stage_errors_total", "Errors raised per processing stage.", ["stage"])
+LLM_TOKENS = Histogram(
+    "llm_tokens", "Tokens per LLM call.", ["kind"], buckets=TOKEN_BUCKETS)
+LLM_RETRIES = Counter(
+    "llm_retries_total", "LLM calls retried after an error or empty answer.")
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by result (hit/miss).", ["cache", "result"])
+PREFETCH = Counter(
+    "prefetch_total", "Speculative prefetch outcomes (queued, skipped_*, done, failed, hit, wasted).", ["result"])
+
+
+# ============================================================================
+# Per-request stage timings
+# ============================================================================
+_request_timings: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """
+    Records a stage duration in the histogram and, if called while serving a
+    request, adds it to that request's Server-Timing entry.
+    """
+    STAGE_DURATION.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings["stages"][stage] = timings["stages"].get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - t0)
+
+
+def mark_started() -> None:
+    """
+    Called at the top of a sync endpoint: the time since the request arrived
+    is what it spent waiting for a threadpool worker.
+    """
+    timings = _request_timings.get()
+    if timings is not None and "queue" not in timings["stages"]:
+        observe_stage("queue", time.perf_counter() - timings["start"])
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def server_timing(timings: Dict, total: float) -> str:
+    parts = [f"{name};dur={secs * 1000:.1f}" for name, secs in timings["stages"].items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# ============================================================================
+# ASGI integration
+# ============================================================================
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: times each request, measures the response size and
+    adds a Server-Timing header with the stages recorded while serving it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        timings = {"start": start, "stages": {}}
+        token = _request_timings.set(timings)
+        state = {"status": 500, "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                value = server_timing(timings, time.perf_counter() - start)
+                headers.append((b"server-timing", value.encode("latin-1")))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                state["size"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_DURATION.observe(time.perf_counter() - start, method=scope["method"],
+                                     route=route_path, status=str(state["status"]))
+            RESPONSE_SIZE.observe(state["size"], route=route_path)
+
+
+def instrument_app(app) -> None:
+    """
+    Adds the metrics middleware and exposes GET /metrics.
+    """
+    from fastapi.responses import PlainTextResponse
+
+    app.add_middleware(MetricsMiddleware)
+    if MULTIPROC_DIR:
+        start_flusher(MULTIPROC_DIR)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
+
+
+def instrument_engine(engine) -> None:
+    """
+    Times every SQL statement executed through a SQLAlchemy engine as stage 'db'.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        observe_stage("db", time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        STAGE_ERRORS.inc(stage="db")
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
@@ -0,0 +1,151 @@
+# prefetch.py
+"""
+Speculative prefetch of article extraction for top search results.
+
+Users nearly always open one of the first results, so after a search the
+top N URLs are queued for background extraction into the extraction cache
+(summary.EXTRACTION_CACHE). A later /api/summarize for one of them skips
+the download and parsing.
+
+Prefetching is opt-in (PREFETCH_TOP_N > 0) and deliberately timid:
+- it only runs while the summarizer has idle capacity (`is_idle`),
+- at most one request per host at a time, spaced by PREFETCH_HOST_INTERVAL,
+- queued items older than PREFETCH_MAX_AGE are dropped (the user moved on).
+
+Outcomes are counted in `prefetch_total{result=...}`: hit / done is the hit
+rate, wasted counts prefetched entries evicted or expired without a click.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+from urllib.parse import urlparse
+
+import metrics
+
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "0"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "32"))
+PREFETCH_HOST_INTERVAL = float(os.getenv("PREFETCH_HOST_INTERVAL", "1.0"))
+PREFETCH_MAX_AGE = float(os.getenv("PREFETCH_MAX_AGE", "30"))
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        fetch: Callable[[str], bool],
+        is_cached: Callable[[str], bool],
+        is_idle: Callable[[], bool] = lambda: True,
+        top_n: int = PREFETCH_TOP_N,
+        workers: int = PREFETCH_WORKERS,
+        max_queued: int = PREFETCH_QUEUE_SIZE,
+        host_interval: float = PREFETCH_HOST_INTERVAL,
+        max_age: float = PREFETCH_MAX_AGE,
+    ):
+        self.fetch = fetch
+        self.is_cached = is_cached
+        self.is_idle = is_idle
+        self.top_n = top_n
+        self.workers = workers
+        self.host_interval = host_interval
+        self.max_age = max_age
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue(maxsize=max_queued)
+        self._seq = itertools.count()
+        self._queued: set = set()
+        self._host_busy: set = set()
+        self._host_next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.top_n > 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"prefetch-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def schedule(self, urls: Iterable[str]) -> None:
+        """
+        Queues the first `top_n` URLs; rank order is kept as priority so the
+        first result is fetched first. Never blocks the caller.
+        """
+        if not self.enabled:
+            return
+        self.start()
+        if not self.is_idle():
+            metrics.PREFETCH.inc(result="skipped_budget")
+            return
+        now = time.time()
+        for rank, url in enumerate(itertools.islice(urls, self.top_n)):
+            with self._lock:
+                if url in self._queued or self.is_cached(url):
+                    metrics.PREFETCH.inc(result="skipped_cached")
+                    continue
+                try:
+                    self._queue.put_nowait((rank, next(self._seq), now, url))
+                except queue.Full:
+                    metrics.PREFETCH.inc(result="skipped_full")
+                    return
+                self._queued.add(url)
+            metrics.PREFETCH.inc(result="queued")
+
+    def _acquire_host(self, host: str) -> None:
+        """
+        Blocks until `host` has no prefetch in flight and its interval elapsed.
+        """
+        with self._cond:
+            while True:
+                wait = self._host_next.get(host, 0.0) - time.time()
+                if host not in self._host_busy and wait <= 0:
+                    self._host_busy.add(host)
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def _release_host(self, host: str, requested: bool) -> None:
+        with self._cond:
+            self._host_busy.discard(host)
+            if requested:
+                self._host_next[host] = time.time() + self.host_interval
+            self._cond.notify_all()
+
+    def _work(self) -> None:
+        while True:
+            _, _, queued_at, url = self._queue.get()
+            with self._lock:
+                self._queued.discard(url)
+            if time.time() - queued_at > self.max_age:
+                metrics.PREFETCH.inc(result="skipped_stale")
+                continue
+            host = urlparse(url).netloc
+            self._acquire_host(host)
+            requested = False
+            try:
+                # re-check right before spending a request: waiting on a busy host
+                # can outlast max_age, and capacity may be gone
+                if time.time() - queued_at > self.max_age:
+                    metrics.PREFETCH.inc(result="skipped_stale")
+                    continue
+                if not self.is_idle():
+                    metrics.PREFETCH.inc(result="skipped_budget")
+                    continue
+                requested = True
+                if not self.fetch(url):
+                    metrics.PREFETCH.inc(result="skipped_cached")
+                    continue
+                metrics.PREFETCH.inc(result="done")
+            except Exception as e:
+                metrics.PREFETCH.inc(result="failed")
+                print("[prefetch] Failed:", url, e)
+            finally:
+                self._release_host(host, requested)
@@ -0,0 +1,277 @@
+# related.py
+"""
+"More like this" suggestions from title similarity, fully offline.
+
+Titles are turned into TF-IDF vectors over word tokens and character
+trigrams, L2-normalized and kept as a CSR matrix in NumPy. Each article's
+top-k neighbors are precomputed with a batched sparse product (X · Xᵀ, one
+block of rows at a time), so a request only slices k ids out of an array.
+
+The index serializes into snapshot sections (see snapshot.py) and can be
+updated incrementally when titles are added or removed.
+"""
+from __future__ import annotations
+
+import json
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_K = 10
+MAX_DF = 0.5              # ignore features present in more than half the titles
+REBUILD_THRESHOLD = 0.2   # above this fraction of titles changed since the last full build, rebuild
+BATCH_CELLS = 4_000_000   # rows per batch * catalog size, bounds the dense block
+
+SECTIONS = ("related.meta", "related.vocab", "related.idf", "related.ids", "related.scores")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+# ============================================================================
+# Vectorization
+# ============================================================================
+def title_features(title: str) -> Dict[str, int]:
+    """
+    Word tokens plus character trigrams of each word (padded with spaces).
+    """
+    counts: Dict[str, int] = {}
+    for w in _WORD.findall((title or "").lower()):
+        counts["w:" + w] = counts.get("w:" + w, 0) + 1
+        padded = f" {w} "
+        for i in range(len(padded) - 2):
+            g = padded[i:i + 3]
+            counts[g] = counts.get(g, 0) + 1
+    return counts
+
+
+def fit_vocabulary(titles: List[str], max_df: float = MAX_DF) -> Tuple[Dict[str, int], np.ndarray]:
+    n = len(titles)
+    df: Dict[str, int] = {}
+    for t in titles:
+        for f in title_features(t):
+            df[f] = df.get(f, 0) + 1
+    limit = max(1, int(max_df * n)) if n > 2 else n
+    features = sorted(f for f, c in df.items() if c <= limit)
+    vocab = {f: i for i, f in enumerate(features)}
+    idf = np.array([math.log((1 + n) / (1 + df[f])) + 1 for f in features], dtype=np.float32)
+    return vocab, idf
+
+
+def vectorize(titles: List[str], vocab: Dict[str, int], idf: np.ndarray):
+    """
+    Returns the L2-normalized TF-IDF matrix as CSR arrays (indptr, indices, data).
+    """
+    indptr = np.zeros(len(titles) + 1, dtype=np.int64)
+    indices: List[int] = []
+    data: List[float] = []
+    for r, t in enumerate(titles):
+        row = [(vocab[f], 1.0 + math.log(c)) for f, c in title_features(t).items() if f in vocab]
+        row.sort()
+        norm = math.sqrt(sum((tf * idf[j]) ** 2 for j, tf in row)) or 1.0
+        for j, tf in row:
+            indices.append(j)
+            data.append(tf * idf[j] / norm)
+        indptr[r + 1] = len(indices)
+    return indptr, np.array(indices, dtype=np.int32), np.array(data, dtype=np.float32)
+
+
+def _to_csc(n_rows: int, n_cols: int, indptr, indices, data):
+    rows = np.repeat(np.arange(n_rows, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    col_ptr = np.zeros(n_cols + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n_cols), out=col_ptr[1:])
+    return col_ptr, rows[order], data[order]
+
+
+def _expand_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of arange(s, s + l) for every (s, l), without a Python loop.
+    """
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + (np.arange(total) - offsets)
+
+
+def similarity_block(rows: np.ndarray, n: int, csr, csc) -> np.ndarray:
+    """
+    Cosine similarity of `rows` against all n titles: a (len(rows), n) dense
+    block of the sparse product X[rows] · Xᵀ, accumulated with one bincount.
+    """
+    indptr, indices, data = csr
+    col_ptr, col_rows, col_data = csc
+    starts, ends = indptr[rows], indptr[rows + 1]
+    pos = _expand_ranges(starts, ends - starts)
+    owner = np.repeat(np.arange(len(rows)), ends - starts)
+    feats, weights = indices[pos], data[pos]
+
+    lengths = col_ptr[feats + 1] - col_ptr[feats]
+    cpos = _expand_ranges(col_ptr[feats], lengths)
+    target = np.repeat(owner, lengths) * n + col_rows[cpos]
+    values = col_data[cpos] * np.repeat(weights, lengths)
+    return np.bincount(target, weights=values, minlength=len(rows) * n).reshape(len(rows), n)
+
+
+def _top_k(block: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    block[np.arange(len(rows)), rows] = -1.0  # never suggest the article itself
+    kk = min(k, block.shape[1])
+    part = np.argpartition(-block, kk - 1, axis=1)[:, :kk] if kk else np.zeros((len(rows), 0), dtype=np.int64)
+    scores = np.take_along_axis(block, part, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    ids = np.take_along_axis(part, order, axis=1).astype(np.int32)
+    scores = np.take_along_axis(scores, order, axis=1).astype(np.float32)
+    ids[scores <= 0] = -1
+    scores[scores <= 0] = 0.0
+    if kk < k:
+        pad = k - kk
+        ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+        scores = np.pad(scores, ((0, 0), (0, pad)))
+    return ids, scores
+
+
+def _iter_batches(rows: np.ndarray, n: int) -> Iterable[np.ndarray]:
+    size = max(1, BATCH_CELLS // max(1, n))
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+# ============================================================================
+# Index
+# ============================================================================
+class RelatedIndex:
+    """
+    Precomputed top-k neighbors per catalog row (row positions, -1 = none).
+    `changed` counts the titles added or removed by incremental updates since
+    the last full build, i.e. how far the frozen vocabulary/IDF may have drifted.
+    """
+
+    def __init__(self, titles: Sequence[str], vocab: Dict[str, int], idf: np.ndarray,
+                 ids: np.ndarray, scores: np.ndarray, changed: int = 0):
+        self.titles = titles
+        self.changed = changed
+        self.vocab = vocab
+        self.idf = idf
+        self.ids = ids
+        self.scores = scores
+        self.k = ids.shape[1] if ids.ndim == 2 else 0
+
+    @classmethod
+    def build(cls, titles: List[str], k: int = DEFAULT_K) -> "RelatedIndex":
+        vocab, idf = fit_vocabulary(titles)
+        n = len(titles)
+        ids = np.full((n, k), -1, dtype=np.int32)
+        scores = np.zeros((n, k), dtype=np.float32)
+        csr = vectorize(titles, vocab, idf)
+        csc = _to_csc(n, len(vocab), *csr)
+        for batch in _iter_batches(np.arange(n), n):
+            ids[batch], scores[batch] = _top_k(similarity_block(batch, n, csr, csc), batch, k)
+        return cls(titles, vocab, idf, ids, scores)
+
+    def update(self, titles: List[str]) -> "RelatedIndex":
+        """
+        Returns an index for the new title list, reusing this one where possible.
+        The vocabulary and IDF stay frozen; only added rows, and rows that lost a
+        neighbor, are recomputed against the whole catalog. Kept rows merge in
+        the added rows as new candidates. Falls back to a full build when too
+        much changed since the last full build (counted across updates, so
+        a series of small edits cannot drift forever).
+        """
+        k = self.k or DEFAULT_K
+        old_pos: Dict[str, List[int]] = {}
+        for i, t in enumerate(self.titles):
+            old_pos.setdefault(t, []).append(i)
+        mapping = np.full(len(self.titles), -1, dtype=np.int64)   # old row -> new row
+        added: List[int] = []
+        for j, t in enumerate(titles):
+            bucket = old_pos.get(t)
+            if bucket:
+                mapping[bucket.pop(0)] = j
+            else:
+                added.append(j)
+        removed = int((mapping < 0).sum())
+        changed = self.changed + len(added) + removed
+        if not self.titles or changed / max(1, len(titles)) > REBUILD_THRESHOLD:
+            return RelatedIndex.build(titles, k)
+        if not added and not removed and len(titles) == len(self.titles) and np.all(mapping == np.arange(len(titles))):
+            return self
+
+        n = len(titles)
+        ids = np.full((n, k), -1, dtype=np.int32)
+        scores = np.zeros((n, k), dtype=np.float32)
+        kept_old = np.nonzero(mapping >= 0)[0]
+        kept_new = mapping[kept_old]
+        old_ids = self.ids[kept_old]
+        remapped = np.where(old_ids >= 0, mapping[np.maximum(old_ids, 0)], -1)
+        lost = ((old_ids >= 0) & (remapped < 0)).any(axis=1)
+        ids[kept_new] = remapped
+        scores[kept_new] = np.where(remapped >= 0, self.scores[kept_old], 0.0)
+
+        csr = vectorize(titles, self.vocab, self.idf)
+        csc = _to_csc(n, len(self.vocab), *csr)
+        added_rows = np.array(added, dtype=np.int64)
+
+        # Added rows: full neighbor lists; their columns are new candidates for kept rows.
+        for batch in _iter_batches(added_rows, n):
+            block = similarity_block(batch, n, csr, csc)
+            cand = block[:, kept_new].T                       # (kept, batch)
+            merged_ids = np.concatenate([ids[kept_new], np.broadcast_to(batch, cand.shape).astype(np.int32)], axis=1)
+            merged_scores = np.concatenate([scores[kept_new], cand.astype(np.float32)], axis=1)
+            merged_scores[merged_ids < 0] = 0.0
+            order = np.argsort(-merged_scores, axis=1, kind="stable")[:, :k]
+            top_ids = np.take_along_axis(merged_ids, order, axis=1)
+            top_scores = np.take_along_axis(merged_scores, order, axis=1)
+            top_ids[top_scores <= 0] = -1
+            ids[kept_new], scores[kept_new] = top_ids, np.maximum(top_scores, 0.0)
+            ids[batch], scores[batch] = _top_k(block, batch, k)
+
+        # Kept rows whose neighbor list shrank: recompute from scratch.
+        redo = kept_new[lost]
+        for batch in _iter_batches(redo, n):
+            ids[batch], scores[batch] = _top_k(similarity_block(batch, n, csr, csc), batch, k)
+        return RelatedIndex(list(titles), self.vocab, self.idf, ids, scores, changed)
+
+    def neighbors(self, row: int, k: Optional[int] = None) -> List[Tuple[int, float]]:
+        k = self.k if k is None else min(k, self.k)
+        out = []
+        for j, s in zip(self.ids[row, :k].tolist(), self.scores[row, :k].tolist()):
+            if j < 0:
+                break
+            out.append((j, s))
+        return out
+
+    # ------------------------------------------------------------------------
+    # Snapshot serialization
+    # ------------------------------------------------------------------------
+    def to_sections(self) -> Dict[str, bytes]:
+        features = sorted(self.vocab, key=self.vocab.get)
+        return {
+            "related.meta": json.dumps({"n": len(self.titles), "k": self.k, "changed": self.changed}).encode("utf-8"),
+            "related.vocab": "\n".join(features).encode("utf-8"),
+            "related.idf": self.idf.astype("<f4").tobytes(),
+            "related.ids": self.ids.astype("<i4").tobytes(),
+            "related.scores": self.scores.astype("<f4").tobytes(),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snap, titles: Sequence[str]) -> Optional["RelatedIndex"]:
+        """
+        Maps the neighbor arrays straight from the snapshot (zero copy);
+        `titles` is kept as given, so a lazy view stays lazy.
+        Returns None if the snapshot has no index or it does not match `titles`.
+        """
+        if not all(snap.has_section(s) for s in SECTIONS):
+            return None
+        meta = json.loads(bytes(snap.section("related.meta")).decode("utf-8"))
+        n, k = meta["n"], meta["k"]
+        if n != len(titles):
+            return None
+        raw_vocab = bytes(snap.section("related.vocab")).decode("utf-8")
+        features = raw_vocab.split("\n") if raw_vocab else []
+        vocab = {f: i for i, f in enumerate(features)}
+        idf = np.frombuffer(snap.section("related.idf"), dtype="<f4")
+        ids = np.frombuffer(snap.section("related.ids"), dtype="<i4").reshape(n, k)
+        scores = np.frombuffer(snap.section("related.scores"), dtype="<f4").reshape(n, k)
+        return cls(titles, vocab, idf, ids, scores, meta.get("changed", 0))
@@ -1,9 +1,17 @@
 # backend/server.py
 from fastapi import FastAPI, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from urllib.parse import urlparse
-from typing import List, Dict
-import os, csv, re
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Dict, Optional, Sequence
+import asyncio, os, re
+
+import admission
+from catalog import CSV_PATH, SNAPSHOT_PATH, parse_csv
+import metrics
+from prefetch import Prefetcher
+from snapshot import CatalogView, Snapshot, open_snapshot
+from suggest import Suggester
 
 app = FastAPI()  # 👈👈 IMPORTANT: "app" variable must be at module level
 
@@ -13,25 +21,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
-
-BASE_DIR = os.path.dirname(__file__)
-CSV_PATH = os.path.join(BASE_DIR, "data", os.getenv("CSV_FILE", "SB_publication_PMC.csv"))
-
-def _first_nonempty(d: dict, keys: list[str]) -> str:
-    for k in keys:
-        v = d.get(k)
-        if v is not None:
-            v = v.strip()
-            if v:
-                return v
-    return ""
-
-def _domain(u: str) -> str | None:
-    try:
-        return urlparse(u).netloc or None
-    except:
-        return None
+metrics.instrument_app(app)
 
 def load_csv_or_fallback() -> List[Dict]:
     """
@@ -40,15 +32,7 @@ def load_csv_or_fallback() -> List[Dict]:
     data: List[Dict] = []
     if os.path.exists(CSV_PATH):
         try:
-            with open(CSV_PATH, newline="", encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                for i, row in enumerate(reader):
-                    title = _first_nonempty(row, ["title", "Title"])
-                    url   = _first_nonempty(row, ["url", "URL", "Url", "link", "Link", "HREF", "Href"])
-                    if not title or not url:
-                        continue
-                    source = _first_nonempty(row, ["source", "Source", "domain", "Domain"]) or _domain(url)
-                    data.append({"id": i+1, "title": title, "url": url, "source": source})
+            data = parse_csv(CSV_PATH)
         except Exception as e:
             print("[CSV] Error reading CSV:", e)
     if not data:
@@ -57,7 +41,33 @@ def load_csv_or_fallback() -> List[Dict]:
         ]
     return data
 
-DATA = load_csv_or_fallback()
+def load_catalog() -> Sequence[Dict]:
+    """
+    Loads the catalog from the prebuilt snapshot (see snapshot.py) when it is
+    present and up to date; otherwise parses the CSV. A snapshot catalog is a
+    read-only view over the mapping that decodes rows on access.
+    """
+    global SNAPSHOT
+    SNAPSHOT = open_snapshot(SNAPSHOT_PATH, CSV_PATH)
+    metrics.cache_lookup("snapshot", SNAPSHOT is not None)
+    if SNAPSHOT is not None:
+        try:
+            return SNAPSHOT.catalog()
+        except Exception as e:
+            print("[snapshot] Error decoding snapshot:", e)
+        # closed outside the except block: its traceback still references views of the mapping
+        SNAPSHOT.close()
+        SNAPSHOT = None
+    return load_csv_or_fallback()
+
+SNAPSHOT: Optional[Snapshot] = None
+DATA = load_catalog()
+TITLES: Sequence[str] = DATA.titles if isinstance(DATA, CatalogView) else [item["title"] for item in DATA]
+# Decoded once: /api/search scans every title per query, rows are decoded only for the hits
+SEARCH_TITLES: List[str] = [(title or "").lower() for title in TITLES]
+SUGGEST = (Suggester.from_snapshot(SNAPSHOT, len(TITLES)) if SNAPSHOT is not None else None) \
+    or Suggester.from_titles(TITLES)
+PREFETCHER: Optional[Prefetcher] = None  # set up with the summary endpoint
 
 def score_match(title: str, terms: List[str]) -> int:
     """
@@ -72,32 +82,81 @@ def score_match(title: str, terms: List[str]) -> int:
     return s
 
 @app.get("/api/health")
-def health():
+async def health():
     """
-    Health check endpoint.
+    Health check endpoint. Async so it never waits for a threadpool worker.
     """
-    return {"ok": True, "count": len(DATA), "csv": os.path.basename(CSV_PATH)}
+    return {
+        "ok": True,
+        "count": len(DATA),
+        "csv": os.path.basename(CSV_PATH),
+        "snapshot": os.path.basename(SNAPSHOT_PATH) if SNAPSHOT is not None else None,
+        "snapshot_replaced": SNAPSHOT.is_replaced() if SNAPSHOT is not None else False,
+    }
 
 @app.get("/api/search")
 def search(q: str = Query("", min_length=0)):
     """
     Search endpoint. Returns all items whose title matches the query terms.
     """
+    metrics.mark_started()
     q = (q or "").strip().lower()
     if not q:
         return []
     terms = [w for w in q.split() if w]
-    results = [item for item in DATA if all(w in (item["title"] or "").lower() for w in terms)]
-    results.sort(key=lambda it: score_match(it["title"], terms), reverse=True)
+    hits = [i for i, title in enumerate(SEARCH_TITLES) if all(w in title for w in terms)]
+    hits.sort(key=lambda i: score_match(SEARCH_TITLES[i], terms), reverse=True)
+    results = [DATA[i] for i in hits]
+    if results:
+        SUGGEST.record_query(terms)
+        if PREFETCHER is not None:
+            PREFETCHER.schedule(item["url"] for item in results)
     return results
 
+@app.get("/api/suggest")
+def suggest(prefix: str = Query("", max_length=100), k: int = Query(SUGGEST.k, ge=1, le=SUGGEST.k)):
+    """
+    Typeahead endpoint. Completes the last word of the prefix from title terms.
+    """
+    return SUGGEST.suggest(prefix, k)
+
+# /api/related (needs numpy)
+try:
+    from related import RelatedIndex
+
+    ROW_BY_ID = {rid: i for i, rid in enumerate(DATA.ids() if isinstance(DATA, CatalogView) else (item["id"] for item in DATA))}
+    RELATED = (RelatedIndex.from_snapshot(SNAPSHOT, TITLES) if SNAPSHOT is not None else None) \
+        or RelatedIndex.build(list(TITLES))
+
+    @app.get("/api/related")
+    def related_articles(id: int = Query(...), k: int = Query(5, ge=1, le=max(1, RELATED.k))):
+        """
+        Returns the articles whose titles are most similar to the given one.
+        """
+        row = ROW_BY_ID.get(id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Article not found")
+        return [
+            {**DATA[j], "score": round(score, 4)}
+            for j, score in RELATED.neighbors(row, k)
+        ]
+except Exception as e:
+    print("[related] Related endpoint disabled:", e)
+
 # /api/summarize (if you have summary.py)
 # ...same imports...
 try:
-    from summary import summarize_url_dict
+    from summary import summarize_url_dict, is_failed_summary, prefetch_extraction, EXTRACTION_CACHE
+
+    # Summaries get their own bounded capacity so search/health never wait behind them
+    SUMMARIZE_ADMISSION = admission.from_env("summarize", "SUMMARIZE", concurrent=8, waiting=16, timeout=10.0)
+
+    def _summarize_admitted(url: str, user_type: str, user_ctx: Dict) -> Dict:
+        metrics.mark_started()
+        return summarize_url_dict(url, user_type, user_context=user_ctx)
 
     @app.get("/api/summarize")
-    def summarize(
+    async def summarize(
         url: str = Query(...),
         userType: str = Query("enthusiast"),
         userName: str = Query("", alias="userName"),
@@ -106,6 +165,7 @@ try:
     ):
         """
         Summarizes an article given its URL and user profile information.
+        Returns 503 with Retry-After when the summarize capacity is exhausted.
         """
         if not url.lower().startswith(("http://", "https://")):
             raise HTTPException(status_code=400, detail="Invalid URL")
@@ -115,8 +175,94 @@ try:
                 "interests": [s.strip() for s in userInterests.split(",") if s.strip()],
                 "experience": userExperience.strip(),
             }
-            return summarize_url_dict(url, userType, user_context=user_ctx)
+            return await SUMMARIZE_ADMISSION.run(_summarize_admitted, url, userType, user_ctx)
+        except admission.Rejected as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Summarizer is busy, try again later",
+                headers={"Retry-After": str(e.retry_after)},
+            )
         except Exception as e:
+            metrics.STAGE_ERRORS.inc(stage="summarize")
             raise HTTPException(status_code=502, detail=f"Could not summarize the URL: {e}")
+
+    # Asynchronous variant: submit a job, then poll for the result
+    import jobs
+
+    class SummaryJobRequest(BaseModel):
+        url: str
+        userType: str = "enthusiast"
+        userName: str = ""
+        userInterests: str = ""
+        userExperience: str = ""
+        priority: int = Field(0, ge=0, le=jobs.MAX_PRIORITY)
+
+    def run_summary_job(params: Dict) -> Dict:
+        result = summarize_url_dict(params["url"], params["user_type"], user_context=params["user_context"])
+        if is_failed_summary(result):
+            # stored as failed (short TTL) so an outage is not served for the whole result TTL
+            raise RuntimeError(result["summary"])
+        return result
+
+    SUMMARY_JOBS = jobs.JobQueue(run_summary_job, store=jobs.store_from_env())
+    # Started now, not on the first submit, so a worker that only answers polls
+    # still renews leases and adopts jobs left behind by workers that exited
+    SUMMARY_JOBS.start()
+
+    async def _get_job(job_id: str) -> Optional[Dict]:
+        # SQLite lookups can block on the store lock or busy waits; keep them off the event loop
+        if isinstance(SUMMARY_JOBS.store, jobs.SQLiteJobStore):
+            return await run_in_threadpool(SUMMARY_JOBS.get, job_id)
+        return SUMMARY_JOBS.get(job_id)
+
+    # Opt-in (PREFETCH_TOP_N): extract the top search results while both summary pools are idle
+    PREFETCH_IDLE_FRACTION = float(os.getenv("PREFETCH_IDLE_FRACTION", "0.5"))
+    PREFETCHER = Prefetcher(
+        prefetch_extraction,
+        EXTRACTION_CACHE.__contains__,
+        is_idle=lambda: SUMMARIZE_ADMISSION.has_idle(PREFETCH_IDLE_FRACTION)
+        and SUMMARY_JOBS.has_idle(PREFETCH_IDLE_FRACTION),
+    )
+    if not PREFETCHER.enabled:
+        PREFETCHER = None
+
+    @app.post("/api/summaries", status_code=202)
+    def submit_summary(req: SummaryJobRequest):
+        """
+        Queues a summary job and returns its id right away. Identical requests
+        share one job while it is pending or its result is still cached.
+        """
+        if not req.url.lower().startswith(("http://", "https://")):
+            raise HTTPException(status_code=400, detail="Invalid URL")
+        params = {
+            "url": req.url,
+            "user_type": req.userType,
+            "user_context": {
+                "name": req.userName.strip(),
+                "interests": [s.strip() for s in req.userInterests.split(",") if s.strip()],
+                "experience": req.userExperience.strip(),
+            },
+        }
+        try:
+            job = SUMMARY_JOBS.submit(params, priority=req.priority)
+        except jobs.QueueFull:
+            raise HTTPException(status_code=503, detail="Too many pending summaries", headers={"Retry-After": "5"})
+        return jobs.public_view(job)
+
+    @app.get("/api/summaries/{job_id}")
+    async def get_summary(job_id: str, wait: float = Query(0, ge=0, le=30)):
+        """
+        Returns the job status, and the summary once done. With `wait`, holds
+        the request up to that many seconds until the job finishes (long-poll).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            job = await _get_job(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Job not found")
+            if job["status"] in (jobs.DONE, jobs.FAILED) or loop.time() >= deadline:
+                return jobs.public_view(job)
+            await asyncio.sleep(0.25)
 except Exception as e:
     print("[summary] Summary endpoint disabled:", e)
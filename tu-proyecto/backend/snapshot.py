@@ -0,0 +1,367 @@
+# snapshot.py
+"""
+Prebuilt binary snapshot of the publication catalog.
+
+The snapshot is built offline from the CSV and mapped read-only (mmap) by
+every uvicorn worker, so parsing happens once and the pages are shared
+through the OS page cache. Rows are decoded on access (`CatalogView`), so a
+worker never holds its own copy of the whole catalog.
+
+Layout (little endian):
+    header   MAGIC (8 bytes) | version u32 | section count u32
+    toc      per section: name (16 bytes, NUL padded) | offset u64 | length u64
+    sections raw bytes, each aligned to 8 bytes
+
+Build it with:
+    python snapshot.py            # writes data/<SNAPSHOT_FILE>
+
+Running workers keep the mapping they opened; restart them to pick up a new
+snapshot (`/api/health` reports `snapshot_replaced` meanwhile).
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Dict, Iterator, List, Optional, Sequence
+
+# ============================================================================
+# Format
+# ============================================================================
+MAGIC = b"SBSNAP\x00\x01"
+SNAPSHOT_VERSION = 2
+
+_HEADER = struct.Struct("<8sII")
+_TOC_ENTRY = struct.Struct("<16sQQ")
+_ROW = struct.Struct("<QIIII")  # blob offset, id, len(title), len(url), len(source)
+_ALIGN = 8
+
+META_SECTION = "meta"
+CATALOG_SECTION = "catalog"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def source_fingerprint(path: str) -> Dict:
+    """
+    Cheap identity of the CSV the snapshot was built from (no full read).
+    """
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+# ============================================================================
+# Catalog encoding
+# ============================================================================
+def encode_catalog(rows: List[Dict]) -> bytes:
+    """
+    Encodes the catalog rows as a fixed-size row table followed by a UTF-8
+    blob. Each row stores its blob offset, so any row decodes on its own.
+    """
+    table = bytearray(struct.pack("<Q", len(rows)))
+    blob = bytearray()
+    for row in rows:
+        title = (row.get("title") or "").encode("utf-8")
+        url = (row.get("url") or "").encode("utf-8")
+        source = (row.get("source") or "").encode("utf-8")
+        table += _ROW.pack(len(blob), int(row["id"]), len(title), len(url), len(source))
+        blob += title + url + source
+    return bytes(table + blob)
+
+
+class CatalogView(Sequence):
+    """
+    Read-only list of catalog rows over an encoded catalog (usually the
+    mapped snapshot). Rows are decoded into fresh dicts on each access.
+    """
+
+    def __init__(self, buf):
+        self._buf = buf
+        (self._count,) = struct.unpack_from("<Q", buf, 0)
+        self._blob = 8 + self._count * _ROW.size
+        if self._blob > len(buf):
+            raise SnapshotError("Truncated catalog")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _row(self, i: int):
+        return _ROW.unpack_from(self._buf, 8 + i * _ROW.size)
+
+    def _str(self, start: int, length: int) -> str:
+        pos = self._blob + start
+        return str(self._buf[pos:pos + length], "utf-8")
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("catalog row out of range")
+        off, rid, lt, lu, ls = self._row(i)
+        pos = self._blob + off
+        raw = self._buf[pos:pos + lt + lu + ls].tobytes()  # one copy, then split
+        return {
+            "id": rid,
+            "title": raw[:lt].decode("utf-8"),
+            "url": raw[lt:lt + lu].decode("utf-8"),
+            "source": raw[lt + lu:].decode("utf-8") or None,
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(self._count):
+            yield self[i]
+
+    def ids(self) -> List[int]:
+        """
+        Row ids straight from the row table, without decoding any strings.
+        """
+        return [rid for _, rid, _, _, _ in _ROW.iter_unpack(self._buf[8:self._blob])]
+
+    def title(self, i: int) -> str:
+        off, _, lt, _, _ = self._row(i)
+        return self._str(off, lt)
+
+    @property
+    def titles(self) -> "TitleView":
+        return TitleView(self)
+
+
+class TitleView(Sequence):
+    """
+    Titles only, decoded on access; what search and the indexes iterate over.
+    """
+
+    def __init__(self, catalog: CatalogView):
+        self._catalog = catalog
+
+    def __len__(self) -> int:
+        return len(self._catalog)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._catalog.title(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("catalog row out of range")
+        return self._catalog.title(i)
+
+
+def decode_catalog(buf) -> List[Dict]:
+    return list(CatalogView(buf))
+
+
+# ============================================================================
+# Writing
+# ============================================================================
+def write_snapshot(path: str, sections: Dict[str, bytes]) -> None:
+    """
+    Writes the sections to `path` atomically (temp file + os.replace), so
+    running workers keep their old mapping until they reload.
+    """
+    names = list(sections)
+    offset = _HEADER.size + _TOC_ENTRY.size * len(names)
+    toc = []
+    for name in names:
+        encoded = name.encode("utf-8")
+        if len(encoded) > 16:
+            raise SnapshotError(f"Section name too long: {name}")
+        offset += -offset % _ALIGN
+        toc.append((encoded, offset, len(sections[name])))
+        offset += len(sections[name])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(names)))
+            for encoded, off, length in toc:
+                f.write(_TOC_ENTRY.pack(encoded, off, length))
+            for (encoded, off, length), name in zip(toc, names):
+                f.write(b"\x00" * (off - f.tell()))
+                f.write(sections[name])
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600; workers may run as another user
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def build_snapshot(path: str, rows: List[Dict], source_path: str,
+                   extra_sections: Optional[Dict[str, bytes]] = None) -> None:
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "count": len(rows),
+        "source": os.path.basename(source_path),
+        "fingerprint": source_fingerprint(source_path),
+    }
+    sections = {
+        META_SECTION: json.dumps(meta).encode("utf-8"),
+        CATALOG_SECTION: encode_catalog(rows),
+    }
+    sections.update(extra_sections or {})
+    write_snapshot(path, sections)
+
+
+# ============================================================================
+# Reading
+# ============================================================================
+class Snapshot:
+    """
+    Read-only mapping of a snapshot file. Sections are exposed as memoryviews
+    over the shared mapping; keep the object alive while they are in use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self._identity = (st.st_ino, st.st_mtime_ns)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._sections = self._read_toc()
+            self.meta: Dict = json.loads(bytes(self.section(META_SECTION)).decode("utf-8"))
+        except Exception:
+            self._mm.close()
+            raise
+
+    def _read_toc(self) -> Dict[str, tuple]:
+        if len(self._mm) < _HEADER.size:
+            raise SnapshotError("Truncated snapshot")
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot (version {version})")
+        sections = {}
+        for i in range(count):
+            raw, off, length = _TOC_ENTRY.unpack_from(self._mm, _HEADER.size + i * _TOC_ENTRY.size)
+            if off + length > len(self._mm):
+                raise SnapshotError("Truncated snapshot")
+            sections[raw.rstrip(b"\x00").decode("utf-8")] = (off, length)
+        return sections
+
+    def has_section(self, name: str) -> bool:
+        return name in self._sections
+
+    def section(self, name: str) -> memoryview:
+        off, length = self._sections[name]
+        return memoryview(self._mm)[off:off + length]
+
+    def catalog(self) -> CatalogView:
+        return CatalogView(self.section(CATALOG_SECTION))
+
+    def is_replaced(self) -> bool:
+        """
+        True once the file at `path` is no longer the one mapped here (rebuilt
+        or removed); this process keeps serving the old data until restart.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return True
+        return (st.st_ino, st.st_mtime_ns) != self._identity
+
+    def is_fresh(self, source_path: str) -> bool:
+        """
+        True if the CSV is missing (nothing to compare against) or unchanged
+        since the snapshot was built.
+        """
+        if not os.path.exists(source_path):
+            return True
+        return self.meta.get("fingerprint") == source_fingerprint(source_path)
+
+    def close(self) -> None:
+        """
+        Unmaps the file. If views of it are still alive (e.g. held by a
+        traceback being handled), the mapping is left for GC to release.
+        """
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+
+
+def open_snapshot(path: str, source_path: str) -> Optional[Snapshot]:
+    """
+    Opens the snapshot if it exists and matches the CSV; returns None otherwise
+    so the caller can fall back to parsing the CSV.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        snap = Snapshot(path)
+    except Exception as e:
+        print("[snapshot] Ignoring unreadable snapshot:", e)
+        return None
+    if not snap.is_fresh(source_path):
+        print("[snapshot] Snapshot is stale, falling back to CSV:", os.path.basename(path))
+        snap.close()
+        return None
+    return snap
+
+
+def _related_sections(rows: List[Dict], previous: Optional[Snapshot]) -> Dict[str, bytes]:
+    """
+    Related-articles index, updated incrementally from the previous snapshot
+    when there is one. Skipped if numpy is not installed.
+    """
+    try:
+        from related import RelatedIndex
+    except ImportError as e:
+        print("[snapshot] Skipping related index:", e)
+        return {}
+    titles = [r["title"] for r in rows]
+    index = None
+    if previous is not None:
+        old_titles = list(previous.catalog().titles)
+        old_index = RelatedIndex.from_snapshot(previous, old_titles)
+        if old_index is not None:
+            index = old_index.update(titles)
+    if index is None:
+        index = RelatedIndex.build(titles)
+    return index.to_sections()
+
+
+def _suggest_sections(rows: List[Dict]) -> Dict[str, bytes]:
+    """
+    Typeahead index, so workers load it instead of rebuilding it at startup.
+    """
+    from suggest import Suggester
+
+    return Suggester.from_titles([r["title"] for r in rows]).to_sections()
+
+
+def main() -> None:
+    from catalog import CSV_PATH, SNAPSHOT_PATH, parse_csv
+
+    if not os.path.exists(CSV_PATH):
+        raise SystemExit(f"CSV not found: {CSV_PATH}")
+    rows = parse_csv(CSV_PATH)
+
+    previous = None
+    if os.path.exists(SNAPSHOT_PATH):
+        try:
+            previous = Snapshot(SNAPSHOT_PATH)
+        except Exception as e:
+            print("[snapshot] Ignoring previous snapshot:", e)
+    try:
+        extra = _related_sections(rows, previous)
+    finally:
+        if previous is not None:
+            previous.close()
+    extra.update(_suggest_sections(rows))
+
+    build_snapshot(SNAPSHOT_PATH, rows, CSV_PATH, extra)
+    print(f"[snapshot] Wrote {len(rows)} rows to {SNAPSHOT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
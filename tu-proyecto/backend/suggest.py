@@ -0,0 +1,171 @@
+# suggest.py
+"""
+Typeahead suggestions over the words of the catalog titles.
+
+Terms live in one sorted array, so the terms sharing a prefix form a
+contiguous range found with two binary searches. Prefixes that cover many
+terms (the short ones, where a scan would be slow) store their top-k
+completions precomputed; the rest are small enough to rank on the fly.
+
+Weights are document frequency plus a popularity boost, fed online from
+searches with `record_query`.
+
+The built index serializes into snapshot sections (see snapshot.py), so
+workers load it instead of rebuilding it from the titles at startup.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import json
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_K = 8
+SCAN_LIMIT = 64           # ranges up to this size are ranked at request time
+MIN_TERM_LEN = 2
+POPULARITY_WEIGHT = 5.0   # weight added per search that used the term
+
+SECTIONS = ("suggest.meta", "suggest.terms", "suggest.weights", "suggest.top")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def title_terms(title: str) -> Iterable[str]:
+    return {w for w in _WORD.findall((title or "").lower()) if len(w) >= MIN_TERM_LEN}
+
+
+class Suggester:
+    def __init__(self, weights: Dict[str, float], k: int = DEFAULT_K,
+                 top: Optional[Dict[str, Tuple[str, ...]]] = None, n_titles: int = 0):
+        self.k = k
+        self.n_titles = n_titles
+        self.terms: List[str] = sorted(weights)
+        self.weights: Dict[str, float] = dict(weights)
+        self._lock = threading.Lock()   # record_query runs on threadpool threads
+        if top is None:
+            self.top: Dict[str, Tuple[str, ...]] = {}
+            self._precompute()
+        else:
+            self.top = top
+
+    @classmethod
+    def from_titles(cls, titles: Iterable[str], popularity: Optional[Dict[str, float]] = None,
+                    k: int = DEFAULT_K) -> "Suggester":
+        df: Dict[str, float] = {}
+        for t in titles:
+            for w in title_terms(t):
+                df[w] = df.get(w, 0) + 1
+        for w, count in (popularity or {}).items():
+            if w in df:
+                df[w] += POPULARITY_WEIGHT * count
+        return cls(df, k, n_titles=len(titles) if isinstance(titles, Sequence) else 0)
+
+    def _rank(self, terms: Iterable[str]) -> Tuple[str, ...]:
+        w = self.weights
+        return tuple(heapq.nsmallest(self.k, terms, key=lambda t: (-w[t], t)))
+
+    def _precompute(self) -> None:
+        """
+        Walks prefix lengths 1, 2, ... grouping the sorted terms; every group
+        larger than SCAN_LIMIT gets its top-k stored.
+        """
+        groups = [(0, len(self.terms))]
+        depth = 1
+        while groups:
+            next_groups = []
+            for lo, hi in groups:
+                i = lo
+                while i < hi:
+                    term = self.terms[i]
+                    if len(term) < depth:
+                        i += 1
+                        continue
+                    prefix = term[:depth]
+                    j = bisect.bisect_left(self.terms, prefix + "\uffff", i, hi)
+                    if j - i > SCAN_LIMIT:
+                        self.top[prefix] = self._rank(self.terms[i:j])
+                        next_groups.append((i, j))
+                    i = j
+            groups = next_groups
+            depth += 1
+
+    def complete(self, prefix: str) -> Tuple[str, ...]:
+        """
+        Top-k terms starting with `prefix` (already lowercased).
+        """
+        if not prefix:
+            return ()
+        cached = self.top.get(prefix)
+        if cached is not None:
+            return cached
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + "\uffff", lo)
+        return self._rank(self.terms[lo:hi])
+
+    def suggest(self, text: str, k: Optional[int] = None) -> List[str]:
+        """
+        Completes the last word of `text`, keeping the words before it.
+        """
+        text = (text or "").lower()
+        if not text.strip() or text[-1].isspace():
+            return []
+        words = text.split()
+        head = " ".join(words[:-1])
+        completions = self.complete(words[-1])[: k or self.k]
+        return [f"{head} {c}" if head else c for c in completions]
+
+    def record_query(self, terms: Iterable[str]) -> None:
+        """
+        Boosts searched terms and refreshes the precomputed lists of their
+        prefixes (O(len(term) * k) per term). Serialized so concurrent searches
+        cannot lose a boost or drop a term from a prefix list.
+        """
+        with self._lock:
+            for term in terms:
+                if term not in self.weights:
+                    continue
+                self.weights[term] += POPULARITY_WEIGHT
+                for d in range(1, len(term) + 1):
+                    prefix = term[:d]
+                    current = self.top.get(prefix)
+                    if current is None:
+                        break
+                    if term in current or len(current) < self.k or self.weights[term] > self.weights[current[-1]]:
+                        self.top[prefix] = self._rank(set(current) | {term})
+
+    # ------------------------------------------------------------------------
+    # Snapshot serialization
+    # ------------------------------------------------------------------------
+    def to_sections(self) -> Dict[str, bytes]:
+        index = {t: i for i, t in enumerate(self.terms)}
+        top = {prefix: [index[t] for t in ranked] for prefix, ranked in self.top.items()}
+        return {
+            "suggest.meta": json.dumps({"n": self.n_titles, "k": self.k}).encode("utf-8"),
+            "suggest.terms": "\n".join(self.terms).encode("utf-8"),
+            "suggest.weights": array("d", (self.weights[t] for t in self.terms)).tobytes(),
+            "suggest.top": json.dumps(top, separators=(",", ":")).encode("utf-8"),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snap, n_titles: int) -> Optional["Suggester"]:
+        """
+        Loads the index stored in the snapshot (copied, since searches update
+        the weights). Returns None if it is missing or built for another catalog.
+        """
+        if not all(snap.has_section(s) for s in SECTIONS):
+            return None
+        meta = json.loads(bytes(snap.section("suggest.meta")).decode("utf-8"))
+        if meta["n"] != n_titles:
+            return None
+        raw_terms = bytes(snap.section("suggest.terms")).decode("utf-8")
+        terms = raw_terms.split("\n") if raw_terms else []
+        weights = array("d")
+        weights.frombytes(bytes(snap.section("suggest.weights")))
+        if len(weights) != len(terms):
+            return None
+        top = {prefix: tuple(terms[i] for i in ranked)
+               for prefix, ranked in json.loads(bytes(snap.section("suggest.top")).decode("utf-8")).items()}
+        return cls(dict(zip(terms, weights)), meta["k"], top, n_titles)
@@ -4,7 +4,9 @@ from __future__ import annotations
 import io
 import os
 import re
+import threading
 import time
+from collections import OrderedDict
 from typing import Dict, List, Tuple, Optional
 from urllib.parse import urlparse
 
@@ -14,19 +16,30 @@ from PyPDF2 import PdfReader
 from dotenv import load_dotenv
 from openai import OpenAI
 
+import metrics
+
 # ============================================================================
 # Configuration
 # ============================================================================
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
-if not API_KEY:
-    raise RuntimeError("Missing API_KEY in .env")
-
 BASE_URL = os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1")
 MODEL_NAME = os.getenv("MODEL_NAME", "openai/gpt-4o-mini")
 
-client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+_client: Optional[OpenAI] = None
+
+def get_client() -> OpenAI:
+    """
+    Creates the LLM client on first use, so the module can be imported
+    (benchmarks, tooling) without an API key.
+    """
+    global _client
+    if _client is None:
+        if not API_KEY:
+            raise RuntimeError("Missing API_KEY in .env")
+        _client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+    return _client
 
 UA = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -38,6 +51,9 @@ DEFAULT_TIMEOUT = 30
 MAX_ATTEMPTS = 4
 RETRY_DELAY = 2
 MAX_CHARS_DEFAULT = 12_000
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "256"))
+EXTRACTION_CACHE_TTL = float(os.getenv("EXTRACTION_CACHE_TTL", "1800"))
+MIN_CONTENT_CHARS = 200   # less extracted text than this cannot be summarized
 
 # ============================================================================
 # Network and parsing utilities
@@ -52,14 +68,16 @@ def domain_of(url: str) -> str:
         return "(unknown)"
 
 def fetch_pdf_text(url: str, timeout: int = DEFAULT_TIMEOUT) -> str:
-    r = requests.get(url, headers={"User-Agent": UA}, timeout=timeout)
-    r.raise_for_status()
-    bio = io.BytesIO(r.content)
-    reader = PdfReader(bio)
-    pages: List[str] = []
-    for p in reader.pages:
-        pages.append(p.extract_text() or "")
-    return "\n".join(pages)
+    with metrics.timed("fetch"):
+        r = requests.get(url, headers={"User-Agent": UA}, timeout=timeout)
+        r.raise_for_status()
+    with metrics.timed("extract"):
+        bio = io.BytesIO(r.content)
+        reader = PdfReader(bio)
+        pages: List[str] = []
+        for p in reader.pages:
+            pages.append(p.extract_text() or "")
+        return "\n".join(pages)
 
 def clean_inline(s: str) -> str:
     return re.sub(r"\s+", " ", s).strip()
@@ -83,9 +101,140 @@ def infer_title_from_text(text: str) -> Optional[str]:
         return None
     return lines[0][:140]
 
+# ============================================================================
+# Extraction cache
+# ============================================================================
+class ExtractionCache:
+    """
+    LRU cache of extracted articles with a TTL. Entries written by the
+    prefetcher are tagged so hits and wasted prefetches can be counted, and
+    in-progress prefetches can be joined instead of fetched twice.
+    """
+
+    def __init__(self, max_entries: int = EXTRACTION_CACHE_SIZE, ttl: float = EXTRACTION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._filling: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def _drop(self, url: str) -> None:
+        entry = self._entries.pop(url)
+        if entry["prefetched"] and not entry["used"]:
+            metrics.PREFETCH.inc(result="wasted")
+
+    def _live(self, url: str) -> Optional[Dict]:
+        """
+        The unexpired entry for `url`; an expired one is dropped (and counted).
+        """
+        entry = self._entries.get(url)
+        if entry is not None and entry["expires"] <= time.time():
+            self._drop(url)
+            return None
+        return entry
+
+    def _sweep(self) -> None:
+        # expired entries nobody asks for again would otherwise only be counted on LRU eviction
+        now = time.time()
+        for url in [u for u, e in self._entries.items() if e["expires"] <= now]:
+            self._drop(url)
+
+    def get(self, url: str) -> Optional[Tuple[str, str, str]]:
+        with self._lock:
+            entry = self._live(url)
+            if entry is None:
+                return None
+            self._entries.move_to_end(url)
+            if entry["prefetched"] and not entry["used"]:
+                metrics.PREFETCH.inc(result="hit")
+            entry["used"] = True
+            return entry["value"]
+
+    def put(self, url: str, value: Tuple[str, str, str], prefetched: bool = False) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if url in self._entries:
+                self._drop(url)
+            self._sweep()
+            self._entries[url] = {
+                "value": value,
+                "expires": time.time() + self.ttl,
+                "prefetched": prefetched,
+                "used": False,
+            }
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return self._live(url) is not None
+
+    def begin_fill(self, url: str) -> bool:
+        """
+        Marks `url` as being fetched; False if it is cached or already in progress.
+        """
+        with self._lock:
+            if url in self._filling or self._live(url) is not None:
+                return False
+            self._filling[url] = threading.Event()
+            return True
+
+    def end_fill(self, url: str) -> None:
+        with self._lock:
+            ev = self._filling.pop(url, None)
+        if ev is not None:
+            ev.set()
+
+    def wait_fill(self, url: str, timeout: float) -> None:
+        with self._lock:
+            ev = self._filling.get(url)
+        if ev is not None:
+            ev.wait(timeout)
+
+
+EXTRACTION_CACHE = ExtractionCache()
+
 def extract_text_from_url(url: str, max_html_timeout: int = DEFAULT_TIMEOUT) -> Tuple[str, str, str]:
     """
-    Returns (title, source, text) from an HTML or PDF URL.
+    Returns (title, source, text) from an HTML or PDF URL, using the
+    extraction cache (and waiting for an in-progress prefetch of the same URL).
+    """
+    cached = EXTRACTION_CACHE.get(url)
+    if cached is None:
+        EXTRACTION_CACHE.wait_fill(url, max_html_timeout)
+        cached = EXTRACTION_CACHE.get(url)
+    metrics.cache_lookup("extraction", cached is not None)
+    if cached is not None:
+        return cached
+    result = fetch_and_extract(url, max_html_timeout)
+    if has_enough_content(result[2]):
+        EXTRACTION_CACHE.put(url, result)  # short text (bot check, failed parse) is retried next time
+    return result
+
+def has_enough_content(text: str) -> bool:
+    return bool(text) and len(text) >= MIN_CONTENT_CHARS
+
+def prefetch_extraction(url: str, max_html_timeout: int = DEFAULT_TIMEOUT) -> bool:
+    """
+    Fetches and extracts `url` into the cache ahead of a likely click.
+    Returns False if it was already cached or being fetched; raises if the
+    page did not yield enough text to be worth caching.
+    """
+    if not EXTRACTION_CACHE.begin_fill(url):
+        return False
+    try:
+        result = fetch_and_extract(url, max_html_timeout)
+        if not has_enough_content(result[2]):
+            raise ValueError("not enough content to cache")
+        EXTRACTION_CACHE.put(url, result, prefetched=True)
+    finally:
+        EXTRACTION_CACHE.end_fill(url)
+    return True
+
+def fetch_and_extract(url: str, max_html_timeout: int = DEFAULT_TIMEOUT) -> Tuple[str, str, str]:
+    """
+    Returns (title, source, text) from an HTML or PDF URL (uncached).
     - HTML: uses trafilatura
     - PDF: uses PyPDF2
     """
@@ -98,8 +247,9 @@ def extract_text_from_url(url: str, max_html_timeout: int = DEFAULT_TIMEOUT) ->
         return title, src, pdf_text
 
     # 2) HEAD/GET to inspect Content-Type
-    r = requests.get(url, headers={"User-Agent": UA}, timeout=max_html_timeout)
-    r.raise_for_status()
+    with metrics.timed("fetch"):
+        r = requests.get(url, headers={"User-Agent": UA}, timeout=max_html_timeout)
+        r.raise_for_status()
     ctype = (r.headers.get("Content-Type") or "").lower()
     if "pdf" in ctype:
         pdf_text = fetch_pdf_text(url)
@@ -109,12 +259,15 @@ def extract_text_from_url(url: str, max_html_timeout: int = DEFAULT_TIMEOUT) ->
     html = r.text
 
     # 3) HTML → trafilatura
-    downloaded = trafilatura.extract(html, include_comments=False, favor_recall=True)
+    with metrics.timed("extract"):
+        downloaded = trafilatura.extract(html, include_comments=False, favor_recall=True)
     if not downloaded or len(downloaded.strip()) < 300:
-        fetched = trafilatura.fetch_url(url)
-        downloaded = trafilatura.extract(
-            fetched, include_comments=False, favor_recall=True
-        ) if fetched else None
+        with metrics.timed("fetch"):
+            fetched = trafilatura.fetch_url(url)
+        with metrics.timed("extract"):
+            downloaded = trafilatura.extract(
+                fetched, include_comments=False, favor_recall=True
+            ) if fetched else None
 
     text = (downloaded or "").strip()
     title = infer_title_from_html(html) or "Article"
@@ -222,6 +375,9 @@ def build_user_context_block(user_context: Dict, article_title: str) -> str:
 # ============================================================================
 # Main functions
 # ============================================================================
+NOT_ENOUGH_CONTENT = "It was not possible to extract enough content from the article."
+SUMMARY_FAILED = "Unable to generate the summary."
+
 def summarize_url_dict(
     url: str,
     user_type: str = "enthusiast",
@@ -233,11 +389,11 @@ def summarize_url_dict(
     { title, source, summary }
     """
     title, src, body = extract_text_from_url(url)
-    if not body or len(body) < 200:
+    if not has_enough_content(body):
         return {
             "title": title or "Article",
             "source": src,
-            "summary": "It was not possible to extract enough content from the article.",
+            "summary": NOT_ENOUGH_CONTENT,
         }
 
     body = body[:max_chars]
@@ -263,13 +419,20 @@ def summarize_url_dict(
     })
 
     last_err = None
-    for _ in range(MAX_ATTEMPTS):
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            metrics.LLM_RETRIES.inc()
         try:
-            chat = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=messages,
-                temperature=0.3,
-            )
+            with metrics.timed("llm"):
+                chat = get_client().chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=messages,
+                    temperature=0.3,
+                )
+            usage = getattr(chat, "usage", None)
+            if usage is not None:
+                metrics.LLM_TOKENS.observe(usage.prompt_tokens or 0, kind="prompt")
+                metrics.LLM_TOKENS.observe(usage.completion_tokens or 0, kind="completion")
             content = chat.choices[0].message.content
             if content and content.strip():
                 return {
@@ -284,9 +447,17 @@ def summarize_url_dict(
     return {
         "title": title or "Article",
         "source": src,
-        "summary": f"Unable to generate the summary. Error: {last_err or 'unknown'}",
+        "summary": f"{SUMMARY_FAILED} Error: {last_err or 'unknown'}",
     }
 
+def is_failed_summary(result: Dict[str, str]) -> bool:
+    """
+    True for the placeholder answers summarize_url_dict gives when extraction
+    or the LLM failed; these should not be cached like real summaries.
+    """
+    summary = result.get("summary") or ""
+    return summary == NOT_ENOUGH_CONTENT or summary.startswith(SUMMARY_FAILED)
+
 def summarize_url(
     url: str,
     user_type: str = "enthusiast",
@@ -0,0 +1,5 @@
+# tests/conftest.py
+import os, sys
+
+# backend modules import each other as top-level modules (uvicorn runs from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,143 @@
+# tests/test_jobs.py
+"""
+Leases, adoption and conditional requeue of summary jobs. Two SQLite stores
+on the same file stand in for two uvicorn worker processes.
+"""
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def short_lease(monkeypatch):
+    monkeypatch.setattr(jobs, "LEASE", 0.5)
+    monkeypatch.setattr(jobs, "LEASE_RENEW", 0.1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def abandoned_job(store, params, status=jobs.RUNNING):
+    """
+    A job left behind by a process that died: its lease already ran out.
+    """
+    job = jobs.new_job(jobs.job_key(params), params, 0, owner="dead-process")
+    job.update(status=status, lease=time.time() - 1)
+    store.put(job)
+    return job
+
+
+def echo(params):
+    return {"summary": params["url"]}
+
+
+def test_renew_extends_only_own_pending_jobs(db):
+    store = jobs.SQLiteJobStore(db)
+    mine = jobs.new_job("a", {"url": "a"}, 0, owner="me")
+    other = jobs.new_job("b", {"url": "b"}, 0, owner="other")
+    done = jobs.new_job("c", {"url": "c"}, 0, owner="me")
+    done["status"] = jobs.DONE
+    for job in (mine, other, done):
+        job["lease"] = 1.0
+        store.put(job)
+
+    now = time.time()
+    store.renew("me", now)
+
+    assert store.get(mine["id"])["lease"] == pytest.approx(now + jobs.LEASE)
+    assert store.get(other["id"])["lease"] == 1.0
+    assert store.get(done["id"])["lease"] == 1.0
+
+
+@pytest.mark.parametrize("store_factory", [jobs.MemoryJobStore, "sqlite"])
+def test_requeue_is_conditional(db, store_factory):
+    store = jobs.SQLiteJobStore(db) if store_factory == "sqlite" else store_factory()
+    job = abandoned_job(store, {"url": "a"})
+
+    assert store.requeue(job["id"], job["updated"] - 1, "me") is None   # touched since read
+
+    adopted = store.requeue(job["id"], job["updated"], "me")
+    assert adopted["status"] == jobs.QUEUED
+    assert adopted["owner"] == "me"
+    assert adopted["lease"] > time.time()
+
+    assert store.requeue(job["id"], job["updated"], "someone-else") is None   # already adopted
+
+    finished = dict(adopted, status=jobs.DONE)
+    store.put(finished)
+    assert store.requeue(job["id"], finished["updated"], "someone-else") is None
+
+
+def test_pending_lists_only_expired_leases(db):
+    store = jobs.SQLiteJobStore(db)
+    live = jobs.new_job("a", {"url": "a"}, 0, owner="alive")
+    store.put(live)
+    dead = abandoned_job(store, {"url": "b"}, status=jobs.QUEUED)
+
+    assert [j["id"] for j in store.pending()] == [dead["id"]]
+
+
+def test_poll_only_queue_adopts_abandoned_job(db):
+    job = abandoned_job(jobs.SQLiteJobStore(db), {"url": "https://example.org/a"})
+
+    queue = jobs.JobQueue(echo, store=jobs.SQLiteJobStore(db), workers=1)
+    queue.start()
+
+    assert wait_for(lambda: queue.get(job["id"])["status"] == jobs.DONE)
+    assert queue.get(job["id"])["result"] == {"summary": "https://example.org/a"}
+
+
+def test_maintenance_adopts_jobs_abandoned_after_start(db, short_lease):
+    queue = jobs.JobQueue(echo, store=jobs.SQLiteJobStore(db), workers=1)
+    queue.start()
+
+    job = abandoned_job(jobs.SQLiteJobStore(db), {"url": "https://example.org/b"}, status=jobs.QUEUED)
+
+    assert wait_for(lambda: queue.get(job["id"])["status"] == jobs.DONE)
+
+
+def test_submit_adopts_abandoned_duplicate(db):
+    params = {"url": "https://example.org/c"}
+    job = abandoned_job(jobs.SQLiteJobStore(db), params)
+
+    queue = jobs.JobQueue(echo, store=jobs.SQLiteJobStore(db), workers=1)
+    shared = queue.submit(params)
+
+    assert shared["id"] == job["id"]
+    assert wait_for(lambda: queue.get(job["id"])["status"] == jobs.DONE)
+
+
+def test_renewed_job_is_not_adopted_by_another_process(db, short_lease):
+    release = threading.Event()
+
+    def slow(params):
+        release.wait(5)
+        return {"summary": "first"}
+
+    first = jobs.JobQueue(slow, store=jobs.SQLiteJobStore(db), workers=1)
+    job = first.submit({"url": "https://example.org/d"})
+    assert wait_for(lambda: first.get(job["id"])["status"] == jobs.RUNNING)
+
+    second = jobs.JobQueue(lambda p: {"summary": "second"}, store=jobs.SQLiteJobStore(db), workers=1)
+    second.start()
+    time.sleep(jobs.LEASE * 3)   # several lease periods, renewed by the first queue
+
+    assert second.store.pending() == []
+    assert first.get(job["id"])["owner"] == first.owner
+    release.set()
+    assert wait_for(lambda: first.get(job["id"])["status"] == jobs.DONE)
+    assert first.get(job["id"])["result"] == {"summary": "first"}
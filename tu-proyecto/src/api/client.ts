@@ -19,6 +19,13 @@ export async function apiSearch(query: string): Promise<APISearchResult[]> {
   }));
 }
 
+export async function apiSuggest(prefix: string, signal?: AbortSignal): Promise<string[]> {
+  const res = await fetch(`/api/suggest?prefix=${encodeURIComponent(prefix)}`, { signal });
+  if (!res.ok) return [];
+  const data = await res.json();
+  return Array.isArray(data) ? data : [];
+}
+
 export async function apiSummarize(
   url: string,
   userType?: string,
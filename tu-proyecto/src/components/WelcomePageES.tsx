@@ -1,7 +1,7 @@
 // src/pages/WelcomePageES.tsx
-import React, { useState, useRef, useMemo } from "react";
+import React, { useState, useRef, useMemo, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
-import { apiSearch, APISearchResult } from "@/api/client";
+import { apiSearch, apiSuggest, APISearchResult } from "@/api/client";
 
 interface UserData {
   email: string;
@@ -25,6 +25,24 @@ export default function WelcomePageES({ onSearch, userData, onBack }: Props) {
   const inputRef = useRef<HTMLInputElement | null>(null);
   const navigate = useNavigate();
 
+  // Typeahead: ask /api/suggest shortly after the user stops typing
+  const [typeahead, setTypeahead] = useState<string[]>([]);
+  useEffect(() => {
+    const prefix = query.trimStart();
+    if (!prefix || /\s$/.test(prefix)) {
+      setTypeahead([]);
+      return;
+    }
+    const ctrl = new AbortController();
+    const timer = setTimeout(() => {
+      apiSuggest(prefix, ctrl.signal).then(setTypeahead).catch(() => {});
+    }, 120);
+    return () => {
+      clearTimeout(timer);
+      ctrl.abort();
+    };
+  }, [query]);
+
   const baseSuggestions = [
     "microgravity",
     "space biology",
@@ -124,12 +142,19 @@ export default function WelcomePageES({ onSearch, userData, onBack }: Props) {
           ref={inputRef}
           value={query}
           onChange={(e) => setQuery(e.target.value)}
+          list="search-typeahead"
+          autoComplete="off"
           placeholder="Search by title…"
           className="flex-1 p-3 rounded border"
         />
         <button className="px-5 py-2 rounded bg-black text-white" type="submit">
           Search
         </button>
+        <datalist id="search-typeahead">
+          {typeahead.map((s) => (
+            <option key={s} value={s} />
+          ))}
+        </datalist>
       </form>
 
       {suggestions.length > 0 && (
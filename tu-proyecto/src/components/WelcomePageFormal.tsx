@@ -1,5 +1,5 @@
-import React, { useState, useRef, useMemo } from "react";
-import { apiSearch, apiSummarize, APISearchResult } from "../api/client";
+import React, { useState, useRef, useMemo, useEffect } from "react";
+import { apiSearch, apiSuggest, apiSummarize, APISearchResult } from "../api/client";
 
 interface UserData {
   email: string;
@@ -29,6 +29,24 @@ export default function WelcomePageFormal({
   const [results, setResults] = useState<APISearchResult[]>([]);
   const [summaryLoading, setSummaryLoading] = useState<string | null>(null);
 
+  // Typeahead: ask /api/suggest shortly after the user stops typing
+  const [typeahead, setTypeahead] = useState<string[]>([]);
+  useEffect(() => {
+    const prefix = query.trimStart();
+    if (!prefix || /\s$/.test(prefix)) {
+      setTypeahead([]);
+      return;
+    }
+    const ctrl = new AbortController();
+    const timer = setTimeout(() => {
+      apiSuggest(prefix, ctrl.signal).then(setTypeahead).catch(() => {});
+    }, 120);
+    return () => {
+      clearTimeout(timer);
+      ctrl.abort();
+    };
+  }, [query]);
+
   const baseSuggestions = [
     "microgravity",
     "space biology",
@@ -191,6 +209,8 @@ export default function WelcomePageFormal({
                 ref={inputRef}
                 value={query}
                 onChange={(e) => setQuery(e.target.value)}
+                list="search-typeahead"
+                autoComplete="off"
                 placeholder="Search by topic, mission, or researcher (e.g., microgravity)"
                 className="flex-1 p-3 rounded-md border border-black/10 bg-white placeholder-gray-400 focus:ring-2 focus:ring-emerald-300 outline-none"
               />
@@ -200,6 +220,11 @@ export default function WelcomePageFormal({
               >
                 Search
               </button>
+              <datalist id="search-typeahead">
+                {typeahead.map((s) => (
+                  <option key={s} value={s} />
+                ))}
+              </datalist>
             </form>
 
             {suggestions.length > 0 && (